@@ -0,0 +1,160 @@
+"""
+Statistics over a directory of saved games
+
+Run from this directory, for example
+    python analyze.py games --workers 4 --out stats.json
+
+Every .json and .cqd file under the directories given is replayed in a process pool
+and only counters are kept: game lengths, move type frequencies, conquer cascade sizes
+(the cells changed by each conquer) and wins by side for each board size.
+Files are handed to the pool a batch at a time, so memory does not grow with the archive.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+from model.state import Board, Move, InvalidMove
+from model.savefile import open_history
+
+EXTENSIONS = ('.json', '.cqd')
+# game lengths are counted in buckets of this many moves
+LENGTH_BUCKET = 10
+
+
+def find_saves(paths: [str]):
+    """yields the save files under paths, walking directories lazily"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def analyze_game(path: str) -> dict:
+    """the counters of one saved game, or of the error reading it"""
+    try:
+        history = open_history(path)
+        board = Board(history.rows, history.cols, history.base_size)
+        types = Counter()
+        cascades = Counter()
+        for mv in history.moves:
+            move = Move(**mv)
+            delta = move.apply(board)
+            types[move.type] += 1
+            if move.type == 'C':
+                cascades[len(delta)] += 1
+    except (OSError, ValueError, KeyError, TypeError, IndexError, InvalidMove) as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    winner = history.moves[-1]['player'] if history.is_finished() else 0
+    return {'size': f'{history.rows}x{history.cols}x{history.base_size}',
+            'length': len(history.moves), 'winner': winner,
+            'types': types, 'cascades': cascades}
+
+
+def analyze_job(path: str) -> (str, dict):
+    return path, analyze_game(path)
+
+
+class Stats:
+    """Counters aggregated over many games, merged one game at a time"""
+
+    def __init__(self):
+        self.games = 0
+        self.errors = 0
+        self.moves = 0
+        self.lengths = Counter()
+        self.longest = 0
+        self.types = Counter()
+        self.cascades = Counter()
+        # board size -> Counter of winners, 0 for unfinished games
+        self.wins = {}
+
+    def add(self, game: dict):
+        if 'error' in game:
+            self.errors += 1
+            return
+        self.games += 1
+        self.moves += game['length']
+        self.lengths[game['length'] // LENGTH_BUCKET * LENGTH_BUCKET] += 1
+        self.longest = max(self.longest, game['length'])
+        self.types.update(game['types'])
+        self.cascades.update(game['cascades'])
+        self.wins.setdefault(game['size'], Counter())[game['winner']] += 1
+
+    def report(self) -> dict:
+        conquers = sum(self.cascades.values())
+        return {
+            'games': self.games, 'errors': self.errors, 'moves': self.moves,
+            'mean_length': self.moves / self.games if self.games else 0,
+            'longest': self.longest,
+            'lengths': {f'{k}-{k + LENGTH_BUCKET - 1}': n
+                        for k, n in sorted(self.lengths.items())},
+            'move_types': {t: n / self.moves for t, n in sorted(self.types.items())}
+            if self.moves else {},
+            'mean_cascade': sum(k * n for k, n in self.cascades.items()) / conquers
+            if conquers else 0,
+            'cascades': dict(sorted(self.cascades.items())),
+            'win_rate': {size: {'games': sum(wins.values()),
+                                'player1': wins[1] / sum(wins.values()),
+                                'player2': wins[2] / sum(wins.values()),
+                                'unfinished': wins[0] / sum(wins.values())}
+                         for size, wins in sorted(self.wins.items())},
+        }
+
+
+def analyze(paths: [str], workers: int, batch: int = 256, errors=None) -> Stats:
+    """
+    aggregates the games under paths with a pool of workers processes,
+    or in this process if workers is 0, writing each unreadable file to errors
+    """
+    stats = Stats()
+    saves = find_saves(paths)
+
+    def merge(results):
+        for path, game in results:
+            stats.add(game)
+            if 'error' in game and errors is not None:
+                print(f'{path}: {game["error"]}', file=errors)
+    if not workers:
+        merge(map(analyze_job, saves))
+        return stats
+    with Pool(workers) as pool:
+        while True:
+            chunk = list(islice(saves, batch))
+            if not chunk:
+                break
+            merge(pool.imap_unordered(analyze_job, chunk,
+                                      chunksize=max(1, batch // (4 * workers))))
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Statistics over saved Conquid games')
+    parser.add_argument('paths', nargs='+', help='save files or directories of them')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='processes replaying games, 0 to replay in this process')
+    parser.add_argument('--batch', type=int, default=256,
+                        help='files handed to the pool at a time')
+    parser.add_argument('--out', default='-', help='file to write the JSON report to')
+    args = parser.parse_args(argv)
+
+    stats = analyze(args.paths, args.workers, args.batch, errors=sys.stderr)
+    report = stats.report()
+    if args.out == '-':
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmarks of the model's hot paths over a range of board sizes
+
+Run from this directory, for example
+    python benchmark.py --out bench.json
+    python benchmark.py --compare bench.json
+
+Each board is set up by a seeded random game, so runs are repeatable and comparable.
+Results are written as JSON with the time per call of every benchmark on every size.
+With --compare, the times are checked against an earlier result file and
+any benchmark slower by more than --threshold is reported, failing the run.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from model.state import Board, Move, Delta, PLAYER, BASE, np
+from model.memory import History
+from model.vanquish import VanquishIndex
+
+# rows, cols, base size
+SIZES = {'small': (7, 14, 3), 'medium': (14, 28, 2), 'large': (21, 42, 3),
+         'stress': (40, 80, 2), 'huge': (101, 202, 3)}
+# rows in each band of a cascade board, one of player 1 cells over the rest of player 2 cells
+CASCADE_BAND = 3
+
+
+def random_history(rows: int, cols: int, base_size: int, fill: float, seed: int) -> History:
+    """
+    a game in which both players acquire cells next to their own until about
+    fill of the board is taken, conquering every few moves, without declaring conquest
+    """
+    rnd = random.Random(seed)
+    history = History(rows, cols, base_size)
+    board = Board(rows, cols, base_size)
+    turns = int(rows * cols * fill / 3)
+    for turn in range(turns):
+        player = turn % 2 + 1
+        if turn % 7 == 6:
+            move = Move('C', player)
+        else:
+            empty = [idx for idx, code in enumerate(board.cells) if code & PLAYER == 0]
+            if len(empty) < 3:
+                break
+            move = Move('A', player, locs=[board.position(idx) for idx in rnd.sample(empty, 3)])
+        move.apply(board)
+        history.store(move)
+    return history
+
+
+def final_board(history: History) -> Board:
+    board = Board(history.rows, history.cols, history.base_size)
+    for move in history.move_history():
+        move.apply(board)
+    return board
+
+
+def bridge(board: Board, player: int) -> Board:
+    """board with a straight row of player cells between the bases, so conquest is possible"""
+    board = board.copy()
+    r, c = board.bases[0]
+    locs = [(r, j) for j in range(board.cols) if board[r, j].player != player]
+    Move('A', player, locs=[loc for loc in locs if not board[loc].base]).apply(board)
+    return board
+
+
+def cascade(rows: int, cols: int, base_size: int, fill: float, seed: int) -> (Board, [int]):
+    """
+    a board on which a conquer by player 1 cascades over about fill of the cells,
+    and the cells player 1 changed last, from which the cascade starts:
+    bands of player 2 cells, each below a row of player 1 cells and holding
+    one player 1 cell at a seeded place, from which the conquest spreads over the band
+    """
+    rnd = random.Random(seed)
+    board = Board(rows, cols, base_size)
+    width = max(2, int(cols * fill))
+    idxs = [r * cols + c for r in range(rows) for c in range(width)
+            if not board.cells[r * cols + c] & BASE]
+    board.write(idxs, bytes(1 if idx // cols % CASCADE_BAND == 0 else 2 for idx in idxs))
+    triggers = [(top + 1) * cols + rnd.randrange(width) for top in range(0, rows - 1, CASCADE_BAND)]
+    triggers = [idx for idx in triggers if not board.cells[idx] & BASE]
+    board.write(triggers, bytes([1]) * len(triggers))
+    return board, triggers
+
+
+def conquer_in_place(board: Board, frontier: [int] = None, engine: str = None):
+    """
+    conquers for player 1 on board and reverts it, so it can be timed repeatedly
+    Before each run the frontier of player 1 is set back to frontier,
+    or to unknown if None so that the whole board is searched
+    """
+    def run():
+        board.frontier = {1: None if frontier is None else set(frontier), 2: None}
+        board.journal = journal = []
+        board.conquer(1, engine)
+        board.journal = None
+        Delta.from_journal(board, journal).revert(board)
+    return run
+
+
+def in_place(move: Move, board: Board, validate: bool = False):
+    """applies move to board and reverts it, so it can be timed repeatedly"""
+    def run():
+        delta = move.apply(board, validate=validate)
+        move.revert(board, delta)
+    return run
+
+
+def cases(size: tuple, seed: int):
+    """yields (name, function) for every benchmark on a board of size"""
+    rows, cols, base_size = size
+    sparse = final_board(random_history(rows, cols, base_size, 0.1, seed))
+    dense_history = random_history(rows, cols, base_size, 0.6, seed)
+    dense = final_board(dense_history)
+    rnd = random.Random(seed)
+    empty = [dense.position(idx) for idx, code in enumerate(dense.cells) if code & PLAYER == 0]
+
+    yield 'init', lambda: Board(rows, cols, base_size)
+    yield 'copy', dense.copy
+    yield 'acquire', in_place(Move('A', 1, locs=rnd.sample(empty, 3)), dense, validate=True)
+    # conquers starting from the cells changed last, like in a game
+    cascading, triggers = cascade(rows, cols, base_size, 0.1, seed)
+    yield 'conquer_sparse', conquer_in_place(cascading, triggers)
+    cascading, triggers = cascade(rows, cols, base_size, 0.6, seed)
+    yield 'conquer_dense', conquer_in_place(cascading, triggers)
+    # every engine searching the whole board
+    engines = ('python', 'numpy') if np is not None else ('python',)
+    for engine in engines:
+        yield f'conquer_dense_{engine}', conquer_in_place(cascading, None, engine)
+    corners = [(i, j) for i in range(rows - 3) for j in range(cols - 3)]
+    yield 'vanquish_validate_all', lambda: [dense.can_vanquish(1, corner) for corner in corners]
+    yield 'vanquish_index_all', lambda: VanquishIndex(dense).corners(1)
+    reachable = bridge(sparse, 1)
+    yield 'conquest_reachable', in_place(Move('Q', 1), reachable)
+    yield 'can_conquest_reachable', lambda: reachable.can_conquest(1)
+    walled = dense.copy()
+    if walled.can_conquest(1):
+        walled = sparse
+    yield 'can_conquest_unreachable', lambda: walled.can_conquest(1)
+    yield 'conquest_path_unreachable', lambda: walled.conquest_path(1)
+    yield 'board_history', dense_history.board_history
+    yield 'states', dense_history.states
+
+
+def measure(func, repeat: int, budget: float) -> dict:
+    """seconds per call, best and median of repeat runs each lasting about budget"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * budget / max(elapsed, 1e-9)))
+    times = [t / number for t in timer.repeat(repeat, number)]
+    return {'best': min(times), 'median': statistics.median(times), 'calls': number}
+
+
+def run(sizes: [str], repeat: int, budget: float, seed: int, only: str) -> dict:
+    results = []
+    for label in sizes:
+        size = SIZES[label]
+        for name, func in cases(size, seed):
+            if only and only not in name:
+                continue
+            timing = measure(func, repeat, budget)
+            results.append(dict(name=name, size=label, shape=list(size), **timing))
+            print(f'{label:>7} {name:<28} {timing["best"] * 1e6:12.1f} us', file=sys.stderr)
+    return {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                     'numpy': np.__version__ if np is not None else None,
+                     'seed': seed, 'repeat': repeat, 'time': time.time()},
+            'results': results}
+
+
+def compare(new: dict, old: dict, threshold: float) -> bool:
+    """prints the change of every benchmark in both results, returns False on a regression"""
+    before = {(r['name'], r['size']): r['best'] for r in old['results']}
+    ok = True
+    for r in new['results']:
+        key = (r['name'], r['size'])
+        if key not in before:
+            continue
+        ratio = r['best'] / before[key]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            ok = False
+        print(f'{r["size"]:>7} {r["name"]:<28} {ratio:6.2f}x{flag}')
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Conquid model')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES),
+                        default=['small', 'medium', 'large', 'stress'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.05,
+                        help='seconds each repeat should last')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', help='run only benchmarks whose name contains this')
+    parser.add_argument('--out', help='file to write the results to')
+    parser.add_argument('--compare', help='earlier results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown ratio above 1 counted as a regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.budget, args.seed, args.only)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            if not compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,79 @@
-from model.state import Board, Position
+from model.state import Board, Position, PLAYER, BASE
 from controller import Controller
+from model import profiling
 import tkinter as tk
 
 
-class BoardView(tk.Frame):
+class ViewColors:
+    """
+    Colors and turn display shared by the board views
+    A view must provide
+        <view>[<position>].recolor(<player>, <base>)
+    for set_view to draw a board, and recolor must record the cell code it shows
+    with <view>.mark_shown so that set_view only redraws cells that differ
+    """
 
-    def __init__(self, master, turn_box):
-        super().__init__(master)
+    def init_colors(self, turn_box):
         self.turn_box = turn_box
         self.colors = {0: 'grey96', 1: "#FF6666", 2: "#6666FF"}
         self.basecolors = {1: "#FF2222", 2: "#2222FF"}
+        # cell codes currently drawn, None until the first full draw
+        self.shown = None
+        self.cols = 0
+
+    def color(self, player, base):
+        return self.basecolors[player] if base else self.colors[player]
+
+    def set_player(self, ply, win=False):
+        self.turn_box['text'] = self.turn_box['text'] = 'PLAYER ' + str(ply)
+        self.turn_box['text'] += ' WINS!' if win else ' TURN'
+
+    def set_busy(self, busy):
+        """shows that a move is being worked out, until called again with busy False"""
+        if busy and self.turn_box['text'] != 'WORKING...':
+            self.turn_text = self.turn_box['text']
+            self.turn_box['text'] = 'WORKING...'
+        elif not busy and self.turn_box['text'] == 'WORKING...':
+            self.turn_box['text'] = self.turn_text
+        self.winfo_toplevel().config(cursor='watch' if busy else '')
+
+    def mark_shown(self, loc: Position, player, base):
+        if self.shown is not None:
+            self.shown[loc[0] * self.cols + loc[1]] = player | (BASE if base else 0)
+
+    @profiling.instrumented('set_view')
+    def set_view(self, board: Board, full=False):
+        """
+        draws board, redrawing only the cells that changed since the last draw
+        unless full is set
+        """
+        cells = board.cells
+        shown = self.shown
+        if full or shown is None or len(shown) != len(cells):
+            changed = range(len(cells))
+            self.shown = bytearray(len(cells))
+        elif shown == cells:
+            return
+        else:
+            changed = [idx for idx, (new, old) in enumerate(zip(cells, shown))
+                       if new != old]
+        if profiling.probe is not None:
+            profiling.probe.count('redrawn', len(changed))
+        cols = board.cols
+        for idx in changed:
+            code = cells[idx]
+            self[divmod(idx, cols)].recolor(code & PLAYER, bool(code & BASE))
+
+
+class BoardView(ViewColors, tk.Frame):
+
+    def __init__(self, master, turn_box):
+        super().__init__(master)
+        self.init_colors(turn_box)
 
     def setup(self, controller, rows, cols):
+        self.cols = cols
+        self.shown = None
         # allow expansion to proper dimension
         for i in range(rows):
             self.rowconfigure(i, weight=1)
@@ -29,20 +91,12 @@ class BoardView(tk.Frame):
         for row in self.tiles:
             for tile in row:
                 tile.destroy()
+        self.shown = None
+        self.pack_forget()
 
     def __getitem__(self, pos: Position):
         return self.tiles[pos[0]][pos[1]]
 
-    def set_player(self, ply, win=False):
-        self.turn_box['text'] = self.turn_box['text'] = 'PLAYER ' + str(ply)
-        self.turn_box['text'] += ' WINS!' if win else ' TURN'
-
-    def set_view(self, board: Board):
-        for i in range(board.rows):
-            for j in range(board.cols):
-                cell = board[i, j]
-                self.tiles[i][j].recolor(cell.player, cell.base)
-
 
 class Tile(tk.Button):
 
@@ -51,11 +105,76 @@ class Tile(tk.Button):
         super().__init__(master,
                          command=lambda: controller.tile_click(loc),
                          overrelief='raised', relief='solid', bd=1)
+        self.loc = loc
         self.grid(row=loc[0], column=loc[1], sticky='nsew')
 
     def recolor(self, player, base):
-        if base:
-            self['bg'] = self.master.basecolors[player]
-        else:
-            self['bg'] = self.master.colors[player]
-        self['activebackground'] = self['bg']
+        color = self.master.color(player, base)
+        self.configure(bg=color, activebackground=color)
+        self.master.mark_shown(self.loc, player, base)
+
+
+class CanvasBoardView(ViewColors, tk.Canvas):
+    """
+    Draws the board as rectangles on a single canvas instead of a button per cell,
+    which keeps large boards quick to create and discard
+    Clicks are mapped to cells from their coordinates
+    """
+
+    def __init__(self, master, turn_box):
+        super().__init__(master, highlightthickness=0, bg='black')
+        self.init_colors(turn_box)
+        self.rows = self.cols = 0
+        self.items = []
+        self.bind('<Configure>', self.resize)
+
+    def setup(self, controller, rows, cols):
+        self.controller = controller
+        self.rows = rows
+        self.cols = cols
+        self.shown = None
+        self.pack(fill='both', expand=1, anchor='center')
+        # draw unit cells, scaled up to the canvas size in resize
+        self.items = [self.create_rectangle(j, i, j + 1, i + 1, outline='black')
+                      for i in range(rows) for j in range(cols)]
+        self.cell_w = self.cell_h = 1
+        self.resize()
+        self.bind('<Button-1>', self.click)
+
+    def resize(self, event=None):
+        if not self.items:
+            return
+        cell_w = max(self.winfo_width(), 1) / self.cols
+        cell_h = max(self.winfo_height(), 1) / self.rows
+        self.scale('all', 0, 0, cell_w / self.cell_w, cell_h / self.cell_h)
+        self.cell_w, self.cell_h = cell_w, cell_h
+
+    def click(self, event):
+        i, j = int(event.y // self.cell_h), int(event.x // self.cell_w)
+        if 0 <= i < self.rows and 0 <= j < self.cols:
+            self.controller.tile_click((i, j))
+
+    def discard_tiles(self):
+        self.delete('all')
+        self.items = []
+        self.shown = None
+        self.unbind('<Button-1>')
+        self.pack_forget()
+
+    def __getitem__(self, pos: Position):
+        return CanvasTile(self, pos)
+
+
+class CanvasTile:
+    """a cell drawn on a CanvasBoardView, recolored like a Tile"""
+    __slots__ = ('canvas', 'loc')
+
+    def __init__(self, canvas: CanvasBoardView, loc: Position):
+        self.canvas = canvas
+        self.loc = loc
+
+    def recolor(self, player, base):
+        canvas = self.canvas
+        item = canvas.items[self.loc[0] * canvas.cols + self.loc[1]]
+        canvas.itemconfigure(item, fill=canvas.color(player, base))
+        canvas.mark_shown(self.loc, player, base)
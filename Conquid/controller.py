@@ -1,7 +1,9 @@
 from model.memory import Cache
-from model.state import Move, InvalidMove
+from model.state import Move, InvalidMove, Delta
 from tkinter import messagebox
 from functools import wraps
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
 
 
 def in_state(*states):
@@ -24,6 +26,17 @@ class Controller:
         self.handlers['Q'] = ConquestHandler(self)
         self.cache = None
         self.boardview: 'BoardView' = None
+        # computer players, None for a human
+        self.ai = {1: None, 2: None}
+        self.ai_pending = False
+        # previews and computer moves worked out on a copy of the board
+        # off the Tk event loop, see start_work
+        self.executor = None
+        self.pending = None
+        # set to stop the searches of the work in progress
+        self.stop = None
+        # bumped to make any work in progress stale
+        self.generation = 0
 
     def link_buttons(self, move_btns, undo, confirm, prev, pause_play, next):
         self.move_btns = move_btns
@@ -35,11 +48,15 @@ class Controller:
         self.set_state('MOVE_BLANK')
 
     def load_cache(self, cache: Cache):
+        self.cancel_preview()
         self.cache = cache
         self.set_state('HIST' if cache.hist.is_finished() else 'MOVE_BLANK')
 
-    @in_state('MOVE_BLANK')
+    @in_state('MOVE_BLANK', 'MOVE_WAIT')
     def button_pressed(self, action):
+        if self.state == 'MOVE_WAIT':
+            self.cancel_preview()
+            self.set_state('MOVE_BLANK')
         if self.handlers[action].propose():
             self.move_attempt = action
 
@@ -54,6 +71,7 @@ class Controller:
 
     def undo(self):
         """Reverts move and deselects move type"""
+        self.cancel_preview()
         self.cache.discard_change()
         self.set_state('MOVE_BLANK')
 
@@ -87,12 +105,111 @@ class Controller:
         self.cache.play_back()
         self.check_prevnext()
 
+    @in_state('HIST', 'MOVE_BLANK')
+    def branch(self):
+        """plays on from the board being played back, keeping the later moves as a variation"""
+        self.cache.branch()
+        self.set_state('HIST' if self.cache.hist.is_finished() else 'MOVE_BLANK')
+
+    @in_state('HIST', 'MOVE_BLANK')
+    def switch_variation(self, node):
+        self.cache.switch(node)
+        self.set_state('HIST' if self.cache.hist.is_finished() else 'MOVE_BLANK')
+
     def game_won(self):
         self.set_state('HIST')
         messagebox.showinfo(
             message=f"PLAYER {3 - self.cache.current_player} WINS!")
         self.pauseplay_btn['state'] = 'disabled'
 
+    def start_work(self, func, *args, **kwargs):
+        """
+        calls func(<copy of the latest board>, *args, **kwargs) on a worker thread,
+        showing the view busy until the result is taken or the work cancelled
+        """
+        self.cancel_preview()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        board = self.cache.latest.copy(tracking=False)
+        # the searches of the copy stop as soon as the work is cancelled
+        board.stop = self.stop = Event()
+        self.pending = self.executor.submit(func, board, *args, **kwargs)
+        self.boardview.set_busy(True)
+
+    def preview(self, move: Move):
+        """
+        applies move to a copy of the latest board on a worker thread,
+        the result is taken by finish_preview
+        The move must be legal, it is only worked out here
+        """
+        self.start_work(move.apply, validate=True)
+        self.set_state('MOVE_WAIT')
+        self.boardview.after(10, self.finish_preview, self.generation, move)
+
+    def finish_preview(self, generation, move: Move):
+        if generation != self.generation:
+            return
+        if not self.pending.done():
+            self.boardview.after(10, self.finish_preview, generation, move)
+            return
+        future = self.pending
+        self.cancel_preview()
+        try:
+            delta = future.result()
+        except InvalidMove:
+            delta = None
+        if delta is not None:
+            self.cache.accept(move, delta)
+            self.set_state('MOVE_END')
+        else:
+            # the move turned out illegal
+            self.set_state('MOVE_BLANK')
+
+    def cancel_preview(self):
+        """drops any preview or computer move in progress, stopping its searches"""
+        self.generation += 1
+        if self.pending is not None:
+            self.stop.set()
+            self.pending.cancel()
+            self.pending = None
+            self.stop = None
+            self.boardview.set_busy(False)
+
+    def set_ai(self, player, ai):
+        """makes ai play for player, or a human if ai is None"""
+        self.ai[player] = ai
+        if self.state == 'AI_WAIT' and player == self.cache.current_player:
+            # the move being worked out is for the player's previous ai
+            self.cancel_preview()
+            self.set_state('MOVE_BLANK')
+        self.schedule_ai()
+
+    def schedule_ai(self):
+        if not self.ai_pending and self.cache and self.boardview:
+            self.ai_pending = True
+            self.boardview.after(50, self.play_ai)
+
+    def play_ai(self):
+        self.ai_pending = False
+        ai = self.ai[self.cache.current_player]
+        if ai and self.state == 'MOVE_BLANK' and not self.cache.hist.is_finished():
+            # the search runs on a worker thread, the move is played by finish_ai
+            self.start_work(ai.choose, self.cache.current_player)
+            self.set_state('AI_WAIT')
+            self.boardview.after(10, self.finish_ai, self.generation)
+
+    def finish_ai(self, generation):
+        if generation != self.generation:
+            return
+        if not self.pending.done():
+            self.boardview.after(10, self.finish_ai, generation)
+            return
+        future = self.pending
+        self.cancel_preview()
+        self.cache.receive(future.result())
+        self.set_state('MOVE_BLANK')
+        self.cache.confirm()
+
     def set_state(self, state: str):
         self.state = state
         if state == 'HIST':
@@ -106,10 +223,20 @@ class Controller:
         if state == 'MOVE_BLANK':
             self.move_attempt = ''
             self.exit_limbo()
+            self.schedule_ai()
         elif state == 'MOVE_START':
             self.enter_limbo()
         elif state == 'MOVE_END':
             self.enter_limbo(confirmable=True)
+        elif state == 'MOVE_WAIT':
+            # a move type may still be picked instead of the one being worked out
+            self.enter_limbo()
+            for btn in self.move_btns.values():
+                btn['state'] = 'normal'
+        elif state == 'AI_WAIT':
+            # nothing may be played or undone while the computer thinks
+            self.enter_limbo()
+            self.undo_btn['state'] = 'disabled'
 
     def enter_limbo(self, reversible=True, confirmable=False):
         for btn in self.move_btns.values():
@@ -166,9 +293,14 @@ class ConquerHandler:
         self.controller = controller
 
     def propose(self):
-        self.controller.cache.receive(
-            Move('C', self.controller.cache.current_player))
-        self.controller.set_state('MOVE_END')
+        cache = self.controller.cache
+        move = Move('C', cache.current_player)
+        if cache.latest.can_conquer(cache.current_player):
+            self.controller.preview(move)
+        else:
+            # nothing to conquer, the conquer only passes the turn
+            cache.accept(move, Delta.empty())
+            self.controller.set_state('MOVE_END')
         return True
 
     # null
@@ -203,12 +335,10 @@ class ConquestHandler:
         self.controller = controller
 
     def propose(self):
-        try:
-            self.controller.cache.receive(
-                Move('Q', self.controller.cache.current_player))
-        except InvalidMove:
+        cache = self.controller.cache
+        if not cache.latest.can_conquest(cache.current_player):
             return False
-        self.controller.set_state('MOVE_END')
+        self.controller.preview(Move('Q', cache.current_player))
         return True
 
     # null
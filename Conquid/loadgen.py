@@ -0,0 +1,97 @@
+"""
+Load generator for server.py: plays many random games at once and reports
+moves per second and latency percentiles
+
+Run from this directory, for example
+    python loadgen.py --port 7878 --games 50 --watchers 2
+    python loadgen.py --local --games 20 --sizes 14x28 40x80
+
+Every game is played by one connection moving for both players,
+while --watchers other connections join it and count the deltas pushed to them.
+With --local the server runs in this process, sharing its CPU with the clients.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from model.state import Board
+from model.protocol import Client
+from selfplay import RandomAI, parse_size
+from server import GameServer
+
+
+async def play(connect, game_no: int, size: tuple, max_moves: int, watchers: int,
+               latencies: list, counts: dict):
+    rows, cols, base_size = size
+    client = await connect()
+    game = await client.new_game(rows, cols, base_size)
+
+    def on_delta(*delta):
+        counts['deltas'] += 1
+    watching = [await connect(on_delta=on_delta) for i in range(watchers)]
+    for watcher in watching:
+        await watcher.join(game)
+    board = Board(rows, cols, base_size)
+    ai = RandomAI(game_no)
+    for k in range(max_moves):
+        player = k % 2 + 1
+        move = ai.choose(board, player)
+        start = time.perf_counter()
+        await client.move(game, dict(move.__dict__))
+        latencies.append(time.perf_counter() - start)
+        move.apply(board)
+        if move.type == 'Q':
+            break
+    for c in [client] + watching:
+        await c.close()
+
+
+async def run(args) -> dict:
+    server = None
+    if args.local:
+        server = await GameServer().start(args.host, 0, args.unix)
+        if not args.unix:
+            args.port = server.sockets[0].getsockname()[1]
+
+    async def connect(on_delta=None):
+        return await Client.connect(args.host, args.port, args.unix, on_delta)
+    latencies = []
+    counts = {'deltas': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(play(connect, n, args.sizes[n % len(args.sizes)], args.max_moves,
+                                args.watchers, latencies, counts)
+                           for n in range(args.games)))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+    latencies.sort()
+    return {'games': args.games, 'moves': len(latencies), 'seconds': elapsed,
+            'moves_per_sec': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies) * 1e3,
+            'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3,
+            'deltas': counts['deltas']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load generator for the Conquid server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--unix', help='Unix socket path of the server instead of TCP')
+    parser.add_argument('--local', action='store_true', help='run the server in this process')
+    parser.add_argument('--games', type=int, default=20, help='games played at once')
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[(14, 28, 2)],
+                        metavar='ROWSxCOLS[xBASE]')
+    parser.add_argument('--max-moves', type=int, default=200)
+    parser.add_argument('--watchers', type=int, default=1,
+                        help='extra connections joining every game')
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args))
+    print(f'{report["moves"]} moves in {report["games"]} games, {report["seconds"]:.2f}s: '
+          f'{report["moves_per_sec"]:.0f} moves/s, latency p50 {report["p50_ms"]:.2f}ms '
+          f'p99 {report["p99_ms"]:.2f}ms, {report["deltas"]} deltas pushed')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
+import os
 from model.memory import History, Cache
 import tkinter as tk
 from tkinter import filedialog, simpledialog, colorchooser
-from boardview import BoardView
+from boardview import BoardView, CanvasBoardView
 from controller import Controller
-import json
+from model import savefile
+from model.ai import NegamaxAI
+from model import profiling
+
+
+# boards with more cells than this are drawn on a canvas instead of with buttons
+CANVAS_THRESHOLD = 1200
+filetypes = [('JSON', '*.json'), ('Binary', '*.cqd'), ('All files', '*')]
 
 
 def newcmd():
@@ -23,30 +31,34 @@ def saveascmd():
     """
     saves current game
     """
-    save_file = filedialog.asksaveasfilename()
-    with open(save_file, 'w') as sf:
-        json.dump(controller.cache.hist.__dict__, sf)
+    save_file = filedialog.asksaveasfilename(filetypes=filetypes)
+    controller.cache.store_variations()
+    savefile.save(controller.cache.hist, save_file)
 
 
 def opencmd():
     """
-    opens saved game from json file
+    opens saved game from json or binary file
     """
-    open_file = filedialog.askopenfilename()
-    with open(open_file) as of:
-        histdict = json.load(of)
+    open_file = filedialog.askopenfilename(filetypes=filetypes)
+    history = savefile.open_history(open_file)
     bdv.discard_tiles()
-    load_history(History(**histdict))
+    load_history(history)
 
 
 def load_history(history):
     """
     loads the given history into the game
     """
+    global bdv
     cache = Cache(history)
     board = cache.latest
-    width = max(board.cols*40, 800)
-    height = board.rows*40
+    bdv = views['canvas' if board.rows * board.cols > CANVAS_THRESHOLD else 'tiles']
+    controller.boardview = bdv
+    size = 40 if bdv is views['tiles'] else \
+        max(min(40, 1600 // board.cols, 900 // board.rows), 4)
+    width = max(board.cols*size, 800)
+    height = board.rows*size
     root.geometry(f"{width}x{height}+400+200")
     bdv.setup(controller, board.rows, board.cols)
     cache.link_gui(controller, bdv)
@@ -57,11 +69,34 @@ def set_color(player, base=False):
     sets the display colors
     """
     rgb, color = colorchooser.askcolor()
-    if base:
-        bdv.basecolors[player] = color
-    else:
-        bdv.colors[player] = color
-    bdv.set_view(controller.cache.latest)
+    for view in views.values():
+        if base:
+            view.basecolors[player] = color
+        else:
+            view.colors[player] = color
+    bdv.set_view(controller.cache.latest, full=True)
+
+
+def fill_variations():
+    """
+    lists every line of play in the variations menu
+    """
+    variationmenu.delete(2, 'end')
+    tree = controller.cache.tree
+    for leaf in tree.leaves():
+        top = tree.common(leaf, tree.main)
+        label = f'{leaf.depth} moves, branching after move {top.depth}'
+        if leaf is tree.main:
+            label = f'{leaf.depth} moves, main line'
+        variationmenu.add_command(
+            label=label, command=lambda leaf=leaf: controller.switch_variation(leaf))
+
+
+def set_ai(player):
+    """
+    switches player between human and computer
+    """
+    controller.set_ai(player, NegamaxAI() if ai_vars[player].get() else None)
 
 
 root = tk.Tk()
@@ -87,10 +122,28 @@ colormenu.add_command(label='Player 2 Base',
 colormenu.add_command(label='Player 2 Cell',
                       command=lambda: set_color(2))
 
+# variation menu creation
+variationmenu = tk.Menu(menubar, postcommand=fill_variations)
+menubar.add_cascade(menu=variationmenu, label="Variations")
+variationmenu.add_command(label='Branch Here', command=lambda: controller.branch())
+variationmenu.add_separator()
+
+
+# player menu creation
+playermenu = tk.Menu(menubar)
+menubar.add_cascade(menu=playermenu, label="Players")
+ai_vars = {1: tk.BooleanVar(), 2: tk.BooleanVar()}
+playermenu.add_checkbutton(label='Player 1 Computer', variable=ai_vars[1],
+                           command=lambda: set_ai(1))
+playermenu.add_checkbutton(label='Player 2 Computer', variable=ai_vars[2],
+                           command=lambda: set_ai(2))
+
 # controller and boardview setup
 button_frame = tk.Frame(root)
 turn_box = tk.Label(button_frame, text='PLAYER 1 TURN', width=15)
-bdv = BoardView(root, turn_box)
+views = {'tiles': BoardView(root, turn_box),
+         'canvas': CanvasBoardView(root, turn_box)}
+bdv = views['tiles']
 controller = Controller()
 controller.boardview = bdv
 
@@ -142,7 +195,16 @@ confirm_btn.grid(row=0, column=6)
 prev_btn.grid(row=0, column=7)
 pause_play.grid(row=0, column=8)
 next_btn.grid(row=0, column=9)
+# record the timing of every move to the file named by CONQUID_PROFILE,
+# the file keeps every run while the summary at exit covers this one only
+profile_path = os.environ.get('CONQUID_PROFILE')
+session = profiling.RingBuffer()
+if profile_path:
+    profiling.enable(profiling.Tee(profiling.JSONLSink(profile_path), session))
 # rev it up
 load_history(History(14, 28, 2))
 root.focus()
 root.mainloop()
+if profile_path:
+    profiling.disable()
+    print(profiling.report(session.records()))
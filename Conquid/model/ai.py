@@ -0,0 +1,156 @@
+"""
+A computer player searching moves with negamax and alpha-beta pruning
+"""
+
+import time
+from collections import namedtuple
+from model.state import Board, Move
+from model.evaluate import conquest_distance
+from model.movegen import candidate_moves
+from model.zobrist import TranspositionTable, position_key, EXACT, LOWER, UPPER
+
+# score of a won position, less the number of moves taken to win
+WIN = 1 << 20
+
+SearchInfo = namedtuple('SearchInfo', ['move', 'score', 'depth', 'nodes', 'elapsed', 'nps'])
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class NegamaxAI:
+    """
+    Chooses moves by iterative deepening negamax search with alpha-beta pruning
+    and a transposition table, within a time budget of <time_limit> seconds per move
+
+    Positions are scored by each side's conquest distance, the number of empty cells
+    they still need to link their base to the enemy base.
+    Only Acquires of the <candidates> most promising cells for either side are searched,
+    as there are far too many to try them all.
+
+    To choose a move, or to play it through a Cache, call
+        <ai>.choose(<board>, <player>)
+        <ai>.play(<cache>)
+    After each move <ai>.info holds a SearchInfo with the depth reached and nodes per second.
+    """
+    def __init__(self, time_limit: float = 1.0, max_depth: int = 16,
+                 candidates: int = 6, table_size: int = 1 << 16):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.candidates = candidates
+        self.table = TranspositionTable(table_size)
+        self.evals = TranspositionTable(table_size, policy='always')
+        self.info = None
+
+    def play(self, cache: 'Cache'):
+        move = self.choose(cache.latest, cache.current_player)
+        cache.receive(move)
+        cache.confirm()
+
+    def choose(self, board: Board, player: int) -> Move:
+        start = time.perf_counter()
+        self.deadline = start + self.time_limit
+        self.nodes = 0
+        board = board.copy(tracking=False)
+        moves = self.moves(board, player, None)
+        best, score, depth = moves[0], 0, 0
+        if len(moves) > 1:
+            for d in range(1, self.max_depth + 1):
+                try:
+                    score, move = self.search_root(board, player, d, moves)
+                except SearchTimeout:
+                    break
+                best, depth = move, d
+                # search the best move first next time
+                moves.remove(move)
+                moves.insert(0, move)
+                if abs(score) >= WIN - self.max_depth:
+                    break
+        elapsed = time.perf_counter() - start
+        self.info = SearchInfo(best, score, depth, self.nodes, elapsed,
+                               self.nodes / elapsed if elapsed else 0.0)
+        return best
+
+    def search_root(self, board: Board, player: int, depth: int, moves: [Move]):
+        alpha, best = -WIN - 1, None
+        for move in moves:
+            score = -self.child(board, player, move, depth, -WIN - 1, -alpha, 0)
+            if best is None or score > alpha:
+                alpha, best = score, move
+        return alpha, best
+
+    def child(self, board: Board, player: int, move: Move, depth: int,
+              alpha: int, beta: int, ply: int) -> int:
+        """score of the position after move, for the opponent of player"""
+        if move.type == 'Q':
+            return -(WIN - ply)
+        delta = move.apply(board)
+        try:
+            return self.negamax(board, 3 - player, depth - 1, alpha, beta, ply + 1)
+        finally:
+            move.revert(board, delta)
+
+    def negamax(self, board: Board, player: int, depth: int,
+                alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if depth == 0:
+            return self.evaluate(board, player)
+        key = position_key(board, player)
+        entry = self.table.get(key)
+        if entry is not None and entry.depth >= depth:
+            if entry.flag == EXACT:
+                return entry.value
+            if entry.flag == LOWER and entry.value >= beta:
+                return entry.value
+            if entry.flag == UPPER and entry.value <= alpha:
+                return entry.value
+        original_alpha = alpha
+        best_score, best_move = -WIN - 1, None
+        for move in self.moves(board, player, entry and entry.move):
+            score = -self.child(board, player, move, depth, -beta, -alpha, ply)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table.store(key, best_score, depth, flag, best_move.__dict__)
+        return best_score
+
+    def evaluate(self, board: Board, player: int) -> int:
+        """score of board for player, who is about to move"""
+        key = position_key(board, player)
+        entry = self.evals.get(key)
+        if entry is not None:
+            return entry.value
+        score = self.score(board, player)
+        self.evals.store(key, score)
+        return score
+
+    def score(self, board: Board, player: int) -> int:
+        cap = board.rows * board.cols
+        mine = min(conquest_distance(board, player), cap)
+        if mine == 0:
+            return WIN
+        theirs = min(conquest_distance(board, 3 - player), cap)
+        cells = board.cells
+        material = cells.count(player) - cells.count(3 - player)
+        return 64 * (theirs - mine) + material
+
+    def moves(self, board: Board, player: int, first: dict) -> [Move]:
+        """the moves worth searching, most promising first"""
+        moves = candidate_moves(board, player, self.candidates)
+        if first is not None:
+            for i, move in enumerate(moves):
+                if move.__dict__ == first:
+                    moves.insert(0, moves.pop(i))
+                    break
+        return moves
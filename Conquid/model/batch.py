@@ -0,0 +1,157 @@
+"""
+Many boards of the same shape processed together as one NumPy array
+"""
+
+from model.state import Board, PLAYER, BASE, np
+
+
+def neighbours(mask: 'np.ndarray') -> 'np.ndarray':
+    """for a stack of boolean boards, whether each cell touches a set cell"""
+    near = np.zeros_like(mask)
+    near[:, 1:] |= mask[:, :-1]
+    near[:, :-1] |= mask[:, 1:]
+    near[:, :, 1:] |= mask[:, :, :-1]
+    near[:, :, :-1] |= mask[:, :, 1:]
+    return near
+
+
+def neighbour_counts(mask: 'np.ndarray', out: 'np.ndarray') -> 'np.ndarray':
+    """for a stack of boolean boards, how many set cells each cell touches"""
+    out.fill(0)
+    out[:, 1:] += mask[:, :-1]
+    out[:, :-1] += mask[:, 1:]
+    out[:, :, 1:] += mask[:, :, :-1]
+    out[:, :, :-1] += mask[:, :, 1:]
+    return out
+
+
+class BoardBatch:
+    """
+    N boards of the same shape stored as one (N, rows, cols) uint8 array of cell codes
+
+    Moves are given per board as arrays, a player for each board and
+    the positions or corners to use, and are applied to all boards at once:
+        <batch>.acquire(<players>, <locs>)
+        <batch>.conquer(<players>)
+        <batch>.vanquish(<players>, <corners>)
+        <batch>.can_conquest(<players>)
+    A single player number may be given for every board.
+    Passing validate=True to acquire or vanquish only applies the move to the boards
+    on which it is legal, and returns which those were.
+    """
+    def __init__(self, rows: int, cols: int, base_size: int, n: int):
+        if np is None:
+            raise ImportError('BoardBatch requires numpy')
+        template = Board(rows, cols, base_size)
+        self.template = template
+        self.rows, self.cols, self.base_size = rows, cols, base_size
+        self.grids = np.repeat(template.array()[None], n, axis=0)
+
+    @classmethod
+    def from_boards(cls, boards: [Board]) -> 'BoardBatch':
+        first = boards[0]
+        batch = cls(first.rows, first.cols, first.base_size, 0)
+        batch.grids = np.stack([board.array() for board in boards])
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.grids)
+
+    def board(self, i: int) -> Board:
+        board = self.template.copy()
+        board.set_cells(self.grids[i].tobytes())
+        return board
+
+    def boards(self) -> [Board]:
+        return [self.board(i) for i in range(len(self))]
+
+    def players(self, players) -> 'np.ndarray':
+        """players as one uint8 per board, shaped to broadcast over the cells"""
+        return np.broadcast_to(np.asarray(players, dtype=np.uint8),
+                               (len(self),))[:, None, None]
+
+    def acquire(self, players, locs, validate: bool = False) -> 'np.ndarray':
+        """
+        locs is an (N, k, 2) array of the k positions each board acquires
+        returns which boards the move was applied to
+        """
+        locs = np.asarray(locs)
+        n = np.arange(len(self))[:, None]
+        rows, cols = locs[..., 0], locs[..., 1]
+        ok = np.ones(len(self), dtype=bool)
+        if validate:
+            inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+            ok = inside.all(axis=1)
+            rows, cols = np.where(inside, rows, 0), np.where(inside, cols, 0)
+            ok &= (self.grids[n, rows, cols] & PLAYER == 0).all(axis=1)
+        players = self.players(players)[:, :, 0]
+        codes = self.grids[n, rows, cols]
+        self.grids[n, rows, cols] = np.where(ok[:, None], (codes & BASE) | players, codes)
+        return ok
+
+    def conquer(self, players):
+        """conquers on every board until no board changes"""
+        players = self.players(players)
+        grids = self.grids
+        mine = grids == players
+        enemy = grids == 3 - players
+        touching = np.empty(grids.shape, dtype=np.uint8)
+        while True:
+            conquered = enemy & (neighbour_counts(mine, touching) >= 2)
+            if not conquered.any():
+                break
+            mine |= conquered
+            enemy &= ~conquered
+        np.copyto(grids, np.broadcast_to(players, grids.shape), where=mine)
+
+    def can_vanquish(self, players, corners) -> 'np.ndarray':
+        """corners is an (N, 2) array of the square each board would vanquish"""
+        corners = np.asarray(corners)
+        r, c = corners[:, 0], corners[:, 1]
+        ok = (r >= 0) & (r <= self.rows - 4) & (c >= 0) & (c <= self.cols - 4)
+        r, c = np.where(ok, r, 0), np.where(ok, c, 0)
+        n = np.arange(len(self))
+        # pad by one so that the surrounding cells are always in range
+        padded = np.pad(self.grids, ((0, 0), (1, 1), (1, 1)), constant_values=PLAYER | BASE)
+        offsets = np.arange(4)
+        square = padded[n[:, None, None], (r + 1)[:, None, None] + offsets[None, :, None],
+                        (c + 1)[:, None, None] + offsets[None, None, :]]
+        ok &= (square == (square[:, :1, :1] & PLAYER)).all(axis=(1, 2))
+        dr, dc = np.array(Board.vanquish_surround).T
+        ring = padded[n[:, None], (r + 1)[:, None] + dr, (c + 1)[:, None] + dc]
+        players = self.players(players)[:, 0]
+        ok &= (ring == players).sum(axis=1) >= 4
+        return ok
+
+    def vanquish(self, players, corners, validate: bool = False) -> 'np.ndarray':
+        """returns which boards the move was applied to"""
+        corners = np.asarray(corners)
+        if validate:
+            ok = self.can_vanquish(players, corners)
+        else:
+            ok = np.ones(len(self), dtype=bool)
+        n = np.flatnonzero(ok)
+        r, c = corners[n, 0], corners[n, 1]
+        offsets = np.arange(4)
+        # the squares of all boards cleared at once, indexed like in can_vanquish
+        self.grids[n[:, None, None], r[:, None, None] + offsets[None, :, None],
+                   c[:, None, None] + offsets[None, None, :]] &= BASE
+        return ok
+
+    def can_conquest(self, players) -> 'np.ndarray':
+        """whether each board's player may declare conquest, by flood filling all boards together"""
+        players = self.players(players)
+        grids = self.grids
+        mine = grids & PLAYER == players
+        target = grids == (3 - players) | BASE
+        reach = np.zeros(grids.shape, dtype=bool)
+        for player, (r, c) in enumerate(self.template.bases, 1):
+            reach[:, r, c] |= players[:, 0, 0] == player
+        found = np.zeros(len(self), dtype=bool)
+        while True:
+            near = neighbours(reach)
+            found |= (near & target).any(axis=(1, 2))
+            grown = reach | (near & mine & ~found[:, None, None])
+            if (grown == reach).all():
+                return found
+            reach = grown
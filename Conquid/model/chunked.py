@@ -0,0 +1,293 @@
+"""
+A Board for boards far larger than the window can show, storing only the chunks in use
+
+Cells are kept in square chunks of CHUNK x CHUNK cells, and a chunk holding
+only empty cells takes no memory. Memory, copies and full board scans therefore
+grow with the occupied area instead of rows x cols. The chunks can also live
+in a file mapped into memory instead of the process heap.
+"""
+
+import mmap
+import os
+import re
+import tempfile
+from collections import deque
+from model.state import Board, PLAYER, BASE
+from model.zobrist import HashedKeys, CODES
+
+CHUNK = 64
+# chunks room is made for at first
+INITIAL_CHUNKS = 16
+NONEMPTY = re.compile(rb'[^\x00]')
+
+
+class ChunkedCells:
+    """
+    The cells of a board by flat index, read and written like Board.cells,
+    stored as chunks of chunk x chunk cells
+    Chunks are allocated on the first write of a non-empty cell and released
+    once all their cells are empty again. All chunks share one buffer:
+    a bytearray, or the binary file given mapped into memory, which the cells then own.
+    """
+    def __init__(self, rows: int, cols: int, chunk: int = CHUNK, file=None):
+        self.rows = rows
+        self.cols = cols
+        self.chunk = chunk
+        self.size = chunk * chunk
+        # (chunk row, chunk col) -> offset of the chunk in data
+        self.offsets = {}
+        # (chunk row, chunk col) -> number of non-empty cells in the chunk
+        self.counts = {}
+        # offsets of released chunks, all their cells empty
+        self.free = []
+        self.used = 0
+        self.file = file
+        self.data = None
+        if file is None:
+            self.data = bytearray(self.size * INITIAL_CHUNKS)
+        else:
+            self.remap(self.size * INITIAL_CHUNKS)
+
+    def remap(self, length: int):
+        if self.data is not None:
+            self.data.close()
+        self.file.truncate(length)
+        self.data = mmap.mmap(self.file.fileno(), length)
+
+    def close(self):
+        """releases the mapped file, if any"""
+        if self.file is not None:
+            self.data.close()
+            self.file.close()
+
+    def clear(self):
+        """empties every cell, keeping the buffer"""
+        self.data[:self.used] = bytes(self.used)
+        self.offsets = {}
+        self.counts = {}
+        self.free = []
+        self.used = 0
+
+    def __len__(self) -> int:
+        return self.rows * self.cols
+
+    def __iter__(self):
+        """yields every cell like a bytearray, from the dense bytes of the whole board"""
+        return iter(self.tobytes())
+
+    def locate(self, idx: int) -> (tuple, int):
+        """the key of the chunk holding flat index idx and the cell's place in it"""
+        r, c = divmod(idx, self.cols)
+        chunk = self.chunk
+        return (r // chunk, c // chunk), r % chunk * chunk + c % chunk
+
+    def __getitem__(self, idx: int) -> int:
+        key, i = self.locate(idx)
+        offset = self.offsets.get(key)
+        return 0 if offset is None else self.data[offset + i]
+
+    def __setitem__(self, idx: int, code: int):
+        key, i = self.locate(idx)
+        offset = self.offsets.get(key)
+        if offset is None:
+            if not code:
+                return
+            offset = self.allocate(key)
+        old = self.data[offset + i]
+        self.data[offset + i] = code
+        if bool(old) != bool(code):
+            count = self.counts[key] + (1 if code else -1)
+            if count:
+                self.counts[key] = count
+            else:
+                # every cell is empty again, so the chunk may be reused as it is
+                del self.offsets[key], self.counts[key]
+                self.free.append(offset)
+
+    def allocate(self, key: tuple) -> int:
+        if self.free:
+            offset = self.free.pop()
+        else:
+            offset = self.used
+            self.used += self.size
+            if self.used > len(self.data):
+                if self.file is None:
+                    self.data.extend(bytes(len(self.data)))
+                else:
+                    self.remap(2 * len(self.data))
+        self.offsets[key] = offset
+        self.counts[key] = 0
+        return offset
+
+    def items(self):
+        """yields the flat index and code of every non-empty cell"""
+        chunk, cols, data = self.chunk, self.cols, self.data
+        for (kr, kc), offset in list(self.offsets.items()):
+            for match in NONEMPTY.finditer(data, offset, offset + self.size):
+                r, c = divmod(match.start() - offset, chunk)
+                yield (kr * chunk + r) * cols + kc * chunk + c, data[match.start()]
+
+    def count(self, code: int) -> int:
+        """number of cells holding code, like bytearray.count"""
+        nonzero = sum(self.counts.values())
+        if code == 0:
+            return len(self) - nonzero
+        return sum(self.data[offset:offset + self.size].count(code)
+                   for offset in self.offsets.values())
+
+    def copy(self, file=None) -> 'ChunkedCells':
+        """a copy held in memory, or mapped from file if given"""
+        cpy = ChunkedCells.__new__(ChunkedCells)
+        cpy.__dict__.update(self.__dict__)
+        cpy.offsets = dict(self.offsets)
+        cpy.counts = dict(self.counts)
+        cpy.free = list(self.free)
+        length = max(self.used, self.size)
+        cpy.file = file
+        if file is None:
+            cpy.data = bytearray(self.data[:length])
+        else:
+            cpy.data = None
+            cpy.remap(length)
+            cpy.data[:length] = self.data[:length]
+        return cpy
+
+    def tobytes(self) -> bytes:
+        """the cells as one dense byte per cell, like bytes(Board.cells)"""
+        dense = bytearray(len(self))
+        for idx, code in self.items():
+            dense[idx] = code
+        return bytes(dense)
+
+
+class Neighbours:
+    """Board.adjacency computed per cell, for boards too large for the table"""
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+
+    def __getitem__(self, idx: int) -> [int]:
+        cols = self.cols
+        r, c = divmod(idx, cols)
+        nbrs = []
+        if c + 1 < cols:
+            nbrs.append(idx + 1)
+        if c > 0:
+            nbrs.append(idx - 1)
+        if r + 1 < self.rows:
+            nbrs.append(idx + cols)
+        if r > 0:
+            nbrs.append(idx - cols)
+        return nbrs
+
+
+class ChunkedBoard(Board):
+    """
+    A Board whose cells are ChunkedCells, played with Moves like any Board
+    To create one, call
+        ChunkedBoard(<rows>, <cols>, <base size>, chunk=<cells per chunk side>, path=<file>)
+    where path, if given, names a file to keep the chunks in.
+    Copies of such a board keep theirs in unnamed files in the same directory.
+    Close the board when done to release its file, or use it in a with statement.
+
+    Searches only visit occupied cells: conquer starts from the frontier or the
+    occupied cells, and conquest follows the player's cells from their base.
+    The numpy conquer engine, Board.array and the conquest tracker are not available,
+    nor is anything visiting every cell such as distance maps, vanquish indexes and the AIs,
+    see Board.require_dense. The Zobrist keys are HashedKeys, so hashes differ from those of a Board.
+    """
+    def __init__(self, r: int, c: int, base_size: int, chunk: int = CHUNK, path: str = None):
+        self.chunk = chunk
+        self.path = path
+        super().__init__(r, c, base_size)
+
+    def allocate(self):
+        file = None if self.path is None else open(self.path, 'w+b')
+        self.cells = ChunkedCells(self.rows, self.cols, self.chunk, file)
+        self.zobrist_keys = HashedKeys(self.rows, self.cols)
+
+    def close(self):
+        self.cells.close()
+
+    def __enter__(self) -> 'ChunkedBoard':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def copy(self, tracking: bool = True) -> 'ChunkedBoard':
+        cpy = ChunkedBoard.__new__(ChunkedBoard)
+        cpy.__dict__.update(self.__dict__)
+        file = None
+        if self.path is not None:
+            file = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.path)))
+        cpy.cells = self.cells.copy(file)
+        cpy.frontier = {player: None if frontier is None else frontier.copy()
+                        for player, frontier in self.frontier.items()}
+        return cpy
+
+    def track_conquest(self):
+        """conquest searches already only visit the player's cells, so there is no tracker"""
+
+    def set_cells(self, cells: bytes):
+        self.cells.clear()
+        self.frontier = {1: None, 2: None}
+        keys = self.zobrist_keys
+        h = 0
+        for idx, code in enumerate(cells):
+            if code:
+                self.cells[idx] = code
+                h ^= keys[idx * CODES + code]
+        self.zobrist = h
+
+    def adjacency(self) -> Neighbours:
+        return Neighbours(self.rows, self.cols)
+
+    def occupied(self):
+        return [idx for idx, code in self.cells.items()]
+
+    def conquer(self, player: int, engine: str = None):
+        """conquers like Board.conquer, always with the python engine"""
+        self.conquer_bfs(player)
+
+    def require_dense(self, what: str):
+        raise NotImplementedError(f'{what} visits every cell, which a ChunkedBoard does not store')
+
+    def array(self):
+        self.require_dense('Board.array')
+
+    def vanquish_corners(self, player: int) -> [tuple]:
+        """checks only the squares bordered by the player's cells, as the others cannot be vanquished"""
+        cells = self.cells
+        corners = set()
+        for idx, code in cells.items():
+            if code == player:
+                r, c = self.position(idx)
+                corners.update((r - dx, c - dy) for dx, dy in Board.vanquish_surround)
+        return sorted(corner for corner in corners if self.can_vanquish(player, corner))
+
+    def conquest_path(self, player: int) -> [int]:
+        enemy_base = (3 - player) | BASE
+        cells = self.cells
+        adj = self.adjacency()
+        start = self.index(self.bases[player-1])
+        prev = {start: start}
+        q = deque((start,))
+        while q:
+            curr = q.popleft()
+            for n in adj[curr]:
+                code = cells[n]
+                if n not in prev and code & PLAYER == player:
+                    prev[n] = curr
+                    q.append(n)
+                if code == enemy_base:
+                    path = []
+                    while curr != start:
+                        path.append(curr)
+                        curr = prev[curr]
+                    return path
+        return None
+
+    def can_conquest(self, player: int) -> bool:
+        return self.conquest_path(player) is not None
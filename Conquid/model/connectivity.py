@@ -0,0 +1,150 @@
+from array import array
+from model.state import Board, PLAYER, BASE
+
+
+class ConquestTracker:
+    """
+    Tracks the connected groups of each player's cells with a union-find
+    so that whether a player can declare conquest is known at all times
+
+    A group can conquer if it holds the player's starting base cell
+    and one of its cells touches a cell of the enemy base.
+    The starting base cell always counts as the player's, like in Board.conquest
+
+    Cells gained by a player are merged into the groups in place.
+    Cells lost by a player (conquer, vanquish) or changes to the enemy base
+    may split or change the groups around them, so only the groups next to
+    those cells are rebuilt, by flooding them from the cells' neighbours.
+
+    A tracker is attached to a board with
+        <board>.track_conquest()
+    after which every change to the board is reported to it.
+    """
+    def __init__(self, board: Board):
+        self.adj = board.adjacency()
+        self.starts = (None,) + tuple(board.index(base) for base in board.bases)
+        # per player: parent of each cell, -1 if the cell is not theirs
+        self.parent = [None, None, None]
+        # per player: whether the group rooted at a cell touches the enemy base
+        self.touch = [None, None, None]
+        self.stale = [False, True, True]
+
+    def copy(self) -> 'ConquestTracker':
+        cpy = ConquestTracker.__new__(ConquestTracker)
+        cpy.adj = self.adj
+        cpy.starts = self.starts
+        cpy.parent = [p and p[:] for p in self.parent]
+        cpy.touch = [t and t[:] for t in self.touch]
+        cpy.stale = self.stale[:]
+        return cpy
+
+    def can_conquest(self, board: Board, player: int) -> bool:
+        if self.stale[player]:
+            self.rebuild(board, player)
+        parent = self.parent[player]
+        return bool(self.touch[player][self.find(parent, self.starts[player])])
+
+    def find(self, parent: array, idx: int) -> int:
+        root = idx
+        while parent[root] != root:
+            root = parent[root]
+        # compress path
+        while parent[idx] != root:
+            parent[idx], idx = root, parent[idx]
+        return root
+
+    def union(self, player: int, a: int, b: int):
+        parent = self.parent[player]
+        ra, rb = self.find(parent, a), self.find(parent, b)
+        if ra != rb:
+            parent[rb] = ra
+            touch = self.touch[player]
+            touch[ra] |= touch[rb]
+
+    def add(self, cells: bytearray, player: int, idx: int):
+        """makes idx a new single cell group of player"""
+        enemy_base = (3 - player) | BASE
+        self.parent[player][idx] = idx
+        self.touch[player][idx] = any(cells[n] == enemy_base for n in self.adj[idx])
+
+    def rebuild(self, board: Board, player: int):
+        cells = board.cells
+        self.parent[player] = array('l', [-1]) * len(cells)
+        self.touch[player] = bytearray(len(cells))
+        start = self.starts[player]
+        owned = [idx for idx, code in enumerate(cells)
+                 if code & PLAYER == player or idx == start]
+        for idx in owned:
+            self.add(cells, player, idx)
+        self.join(cells, player, owned)
+        self.stale[player] = False
+
+    def join(self, cells: bytearray, player: int, idxs: [int]):
+        """unions each of idxs with the neighbouring cells of player"""
+        adj = self.adj
+        start = self.starts[player]
+        for idx in idxs:
+            for n in adj[idx]:
+                if cells[n] & PLAYER == player or n == start:
+                    self.union(player, idx, n)
+
+    def regroup(self, cells: bytearray, player: int, seeds: [int]) -> set:
+        """
+        rebuilds the groups of player holding any of seeds by flooding each from the board
+        returns the cells flooded
+        """
+        adj = self.adj
+        parent = self.parent[player]
+        touch = self.touch[player]
+        enemy_base = (3 - player) | BASE
+        start = self.starts[player]
+        flooded = set()
+        for seed in seeds:
+            if seed in flooded or not (cells[seed] & PLAYER == player or seed == start):
+                continue
+            flooded.add(seed)
+            group = [seed]
+            touching = False
+            # the group grows while it is walked
+            for idx in group:
+                parent[idx] = seed
+                for n in adj[idx]:
+                    code = cells[n]
+                    if code == enemy_base:
+                        touching = True
+                    if n not in flooded and (code & PLAYER == player or n == start):
+                        flooded.add(n)
+                        group.append(n)
+            touch[seed] = touching
+        return flooded
+
+    def update(self, board: Board, idxs: [int], olds: [int]):
+        """reports that the cells idxs changed from the codes olds"""
+        cells = board.cells
+        adj = self.adj
+        for player in (1, 2):
+            if self.stale[player]:
+                continue
+            parent = self.parent[player]
+            enemy_base = (3 - player) | BASE
+            start = self.starts[player]
+            gained = []
+            # cells next to a lost cell or a changed enemy base cell, whose groups are rebuilt
+            seeds = []
+            for idx, old in zip(idxs, olds):
+                new = cells[idx]
+                if old == enemy_base or new == enemy_base:
+                    seeds.extend(adj[idx])
+                if idx == start:
+                    continue
+                if old & PLAYER == player and new & PLAYER != player:
+                    parent[idx] = -1
+                    seeds.extend(adj[idx])
+                elif new & PLAYER == player and old & PLAYER != player:
+                    gained.append(idx)
+            if seeds:
+                flooded = self.regroup(cells, player, seeds)
+                gained = [idx for idx in gained if idx not in flooded]
+            for idx in gained:
+                self.add(cells, player, idx)
+            self.join(cells, player, gained)
@@ -0,0 +1,150 @@
+"""
+Evaluation of how close each player is to declaring conquest
+
+To obtain for both players the number of empty cells they still need
+and the full distance maps behind it, call
+    distances(<board>)
+or batch_distances(<batch>) for all boards of a BoardBatch at once
+"""
+
+from array import array
+from collections import deque, namedtuple
+from model.state import Board, PLAYER, BASE, np
+from model.batch import BoardBatch, neighbours
+
+# distance of cells that cannot be reached
+UNREACHABLE = 1 << 30
+
+# distance and maps are dicts from player to conquest_distance and distance_map
+Distances = namedtuple('Distances', ['distance', 'maps'])
+
+
+def distance_map(board: Board, player: int, sources: [int] = None) -> array:
+    """
+    for every cell, the least number of empty cells the player must acquire
+    to link it to their base, by a 0-1 breadth first search from the base:
+    stepping onto the player's own cells costs 0, onto empty cells 1,
+    and enemy cells cannot be crossed
+
+    sources may give other flat indices to search from instead of the base,
+    each costing what stepping onto it would
+    """
+    board.require_dense('distance_map')
+    cells = board.cells
+    adj = board.adjacency()
+    dist = array('l', [UNREACHABLE]) * len(cells)
+    q = deque()
+    if sources is None:
+        start = board.index(board.bases[player-1])
+        dist[start] = 0
+        q.append(start)
+    else:
+        for idx in sources:
+            owner = cells[idx] & PLAYER
+            if owner == player:
+                dist[idx] = 0
+                q.appendleft(idx)
+            elif owner == 0 and dist[idx] > 1:
+                dist[idx] = 1
+                q.append(idx)
+    while q:
+        curr = q.popleft()
+        d = dist[curr]
+        for n in adj[curr]:
+            owner = cells[n] & PLAYER
+            if owner == player:
+                if d < dist[n]:
+                    dist[n] = d
+                    q.appendleft(n)
+            elif owner == 0 and d + 1 < dist[n]:
+                dist[n] = d + 1
+                q.append(n)
+    return dist
+
+
+def approach_map(board: Board, player: int) -> array:
+    """
+    for every cell, the least number of empty cells the player must acquire
+    to link it to a cell touching the enemy base, counting the cell itself
+    """
+    return distance_map(board, player, frontier(board, player))
+
+
+def frontier(board: Board, player: int) -> [int]:
+    """the flat indices of the cells touching the enemy base"""
+    board.require_dense('frontier')
+    enemy_base = (3 - player) | BASE
+    cells = board.cells
+    adj = board.adjacency()
+    near = set()
+    # the base is a handful of cells, found without looping over the board in python
+    idx = cells.find(enemy_base)
+    while idx >= 0:
+        near.update(n for n in adj[idx] if cells[n] != enemy_base)
+        idx = cells.find(enemy_base, idx + 1)
+    return list(near)
+
+
+def conquest_distance(board: Board, player: int) -> int:
+    """
+    the least number of empty cells the player must acquire before
+    they can declare conquest, UNREACHABLE if the enemy has walled them off
+    """
+    dist = distance_map(board, player)
+    return min((dist[idx] for idx in frontier(board, player)), default=UNREACHABLE)
+
+
+def distances(board: Board) -> Distances:
+    """
+    the conquest_distance and distance_map of both players,
+    each from a single search of the board
+    """
+    maps = {player: distance_map(board, player) for player in (1, 2)}
+    return Distances({player: min((maps[player][idx] for idx in frontier(board, player)),
+                                  default=UNREACHABLE)
+                      for player in (1, 2)}, maps)
+
+
+def batch_distances(batch: BoardBatch) -> Distances:
+    """
+    distances for every board of batch, as (N,) arrays of conquest distances
+    and (N, rows, cols) arrays of distance maps
+
+    the distances are relaxed on all boards at once, each round lowering every
+    cell to its cheapest neighbour plus its own cost, until no board changes
+    """
+    if np is None:
+        raise ImportError('batch_distances requires numpy')
+    grids = batch.grids
+    owners = grids & PLAYER
+    # distances stay below the number of cells, so a small type saves memory traffic
+    dtype = np.int16 if grids[0].size < 1 << 14 else np.int32
+    far = np.iinfo(dtype).max // 2
+    distance, maps = {}, {}
+    for player in (1, 2):
+        cost = (owners == 0).astype(dtype)
+        # raising blocked cells to far keeps them unreachable
+        block = np.where(owners == 3 - player, far, 0).astype(dtype)
+        # padded by a ring of far cells so every cell has 4 neighbours
+        padded = np.full((len(grids), batch.rows + 2, batch.cols + 2), far, dtype=dtype)
+        dist = padded[:, 1:-1, 1:-1]
+        dist[grids == player | BASE] = 0
+        near = np.empty_like(dist)
+        while True:
+            np.minimum(padded[:, :-2, 1:-1], padded[:, 2:, 1:-1], out=near)
+            np.minimum(near, padded[:, 1:-1, :-2], out=near)
+            np.minimum(near, padded[:, 1:-1, 2:], out=near)
+            near += cost
+            np.minimum(near, dist, out=near)
+            np.maximum(near, block, out=near)
+            np.minimum(near, far, out=near)
+            if np.array_equal(near, dist):
+                break
+            dist[...] = near
+        dist = dist.astype(np.int32)
+        dist[dist >= far] = UNREACHABLE
+        enemy_base = grids == (3 - player) | BASE
+        touching = neighbours(enemy_base) & ~enemy_base
+        distance[player] = np.where(touching, dist, UNREACHABLE).min(axis=(1, 2))
+        maps[player] = dist
+    return Distances(distance, maps)
@@ -0,0 +1,310 @@
+"""
+A computer player using Monte Carlo Tree Search with playouts spread over worker processes
+"""
+
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from model.state import Board, Move, PLAYER, move_key
+from model.evaluate import distances, UNREACHABLE
+from model.movegen import candidate_moves
+
+MCTSInfo = namedtuple('MCTSInfo', ['move', 'visits', 'playouts', 'elapsed', 'workers',
+                                   'playouts_per_sec', 'playouts_per_sec_per_core'])
+
+
+def board_spec(board: Board) -> tuple:
+    """the smallest picklable description of board, for sending to a worker"""
+    return board.rows, board.cols, board.base_size, bytes(board.cells)
+
+
+def spec_board(spec: tuple) -> Board:
+    rows, cols, base_size, cells = spec
+    board = Board(rows, cols, base_size)
+    board.set_cells(cells)
+    return board
+
+
+def playout(board: Board, player: int, max_moves: int, rnd: random.Random) -> int:
+    """
+    plays quick semi-random moves from board, player first, and returns the winner
+    Most moves acquire empty cells next to the mover's own cells, a few conquer.
+    After max_moves without a conquest, the side closer to conquest wins.
+    The board is modified in place and restored before returning.
+    """
+    cells = board.cells
+    adj = board.adjacency()
+    size = len(cells)
+    undo = []
+    winner = 0
+    try:
+        for turn in range(max_moves):
+            if board.can_conquest(player):
+                winner = player
+                break
+            if rnd.random() < 0.1:
+                move = Move('C', player)
+            else:
+                locs = []
+                for attempt in range(64):
+                    idx = rnd.randrange(size)
+                    code = cells[idx]
+                    if code & PLAYER == player and rnd.random() < 0.8:
+                        # grow from an own cell
+                        idx = rnd.choice(adj[idx])
+                        code = cells[idx]
+                    if code & PLAYER == 0 and idx not in locs:
+                        locs.append(idx)
+                        if len(locs) == 3:
+                            break
+                move = Move('A', player, locs=[board.position(idx) for idx in locs])
+            undo.append((move, move.apply(board)))
+            player = 3 - player
+        if not winner:
+            distance = distances(board).distance
+            mine, theirs = distance[player], distance[3 - player]
+            if mine == theirs == UNREACHABLE:
+                winner = rnd.choice((1, 2))
+            else:
+                # the side to move gets there first when both are as far
+                winner = player if mine <= theirs else 3 - player
+    finally:
+        for move, delta in reversed(undo):
+            move.revert(board, delta)
+    return winner
+
+
+class Node:
+    """
+    A node of the search tree, reached by <move> made by <player>
+    wins counts the playouts through this node won by <player>
+    virtual counts playouts in flight, scored as losses until they return
+    """
+    __slots__ = ('move', 'player', 'parent', 'children', 'untried',
+                 'visits', 'wins', 'virtual')
+
+    def __init__(self, move: Move, player: int, parent: 'Node'):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0
+        self.virtual = 0
+
+    def terminal(self) -> bool:
+        return self.move is not None and self.move.type == 'Q'
+
+    def uct(self, log_parent: float, exploration: float) -> float:
+        n = self.visits + self.virtual
+        if n == 0:
+            return math.inf
+        return self.wins / n + exploration * math.sqrt(log_parent / n)
+
+
+class Tree:
+    """
+    A search tree over a single board that moves are applied to and reverted from
+    """
+    def __init__(self, board: Board, player: int, candidates: int,
+                 exploration: float, rnd: random.Random):
+        self.board = board
+        self.root = Node(None, 3 - player, None)
+        self.candidates = candidates
+        self.exploration = exploration
+        self.rnd = rnd
+
+    def descend(self):
+        """
+        selects and expands a leaf, leaving the board at its position
+        returns the path of nodes and the deltas to revert
+        """
+        node = self.root
+        path = [node]
+        undo = []
+        while not node.terminal():
+            if node.untried is None:
+                node.untried = candidate_moves(self.board, 3 - node.player, self.candidates)
+                self.rnd.shuffle(node.untried)
+            if node.untried:
+                move = node.untried.pop()
+                child = Node(move, move.player, node)
+                node.children.append(child)
+                undo.append((move, move.apply(self.board)))
+                path.append(child)
+                break
+            log_parent = math.log(node.visits + node.virtual + 1)
+            node = max(node.children, key=lambda c: c.uct(log_parent, self.exploration))
+            undo.append((node.move, node.move.apply(self.board)))
+            path.append(node)
+        return path, undo
+
+    def restore(self, undo):
+        for move, delta in reversed(undo):
+            move.revert(self.board, delta)
+
+    @staticmethod
+    def backup(path: [Node], winner: int, count: int = 1, wins: int = None):
+        """records count playouts, of which wins were won by player 1"""
+        if wins is None:
+            wins = count if winner == 1 else 0
+        for node in path:
+            node.visits += count
+            node.wins += wins if node.player == 1 else count - wins
+
+    def iterate(self, max_moves: int):
+        path, undo = self.descend()
+        leaf = path[-1]
+        try:
+            if leaf.terminal():
+                winner = leaf.player
+            else:
+                winner = playout(self.board, 3 - leaf.player, max_moves, self.rnd)
+        finally:
+            self.restore(undo)
+        self.backup(path, winner)
+
+    def root_stats(self) -> dict:
+        return {move_key(c.move.__dict__): (c.visits, c.wins, c.move.__dict__)
+                for c in self.root.children}
+
+
+def tree_job(spec: tuple, player: int, time_limit: float, candidates: int,
+             exploration: float, max_moves: int, seed: int):
+    """
+    runs a whole search in a worker, for root parallelism
+    at least one iteration is made, however short the time limit
+    """
+    tree = Tree(spec_board(spec), player, candidates, exploration, random.Random(seed))
+    deadline = time.perf_counter() + time_limit
+    playouts = 0
+    while not playouts or time.perf_counter() < deadline:
+        tree.iterate(max_moves)
+        playouts += 1
+    return tree.root_stats(), playouts
+
+
+def playout_job(spec: tuple, player: int, count: int, max_moves: int, seed: int) -> int:
+    """runs count playouts from one position in a worker, returns those won by player 1"""
+    board = spec_board(spec)
+    rnd = random.Random(seed)
+    return sum(playout(board, player, max_moves, rnd) == 1 for i in range(count))
+
+
+class MCTS:
+    """
+    Chooses moves by Monte Carlo Tree Search within <time_limit> seconds per move
+
+    The candidate moves of each node come from movegen.candidate_moves, and
+    leaves are scored by playouts made in place on a single board.
+    The work is spread over <workers> processes (all cores by default, 0 for none):
+        mode 'root' grows an independent tree in each worker and adds up their root visits
+        mode 'leaf' grows one tree here and sends batches of <batch> leaves
+            to the workers, marking their paths with a virtual loss meanwhile
+            so that a batch spreads over different leaves
+
+    To choose a move, or to play it through a Cache, call
+        <mcts>.choose(<board>, <player>)
+        <mcts>.play(<cache>)
+    After each move <mcts>.info holds an MCTSInfo with the playouts per second, per core.
+    Call <mcts>.close() to stop the workers.
+    """
+    def __init__(self, time_limit: float = 1.0, workers: int = None, mode: str = 'root',
+                 batch: int = None, playouts_per_leaf: int = 4, candidates: int = 6,
+                 exploration: float = 1.4, max_moves: int = 60, seed: int = None):
+        if mode not in ('root', 'leaf'):
+            raise ValueError(f'unknown parallel mode {mode!r}')
+        self.time_limit = time_limit
+        self.workers = os.cpu_count() if workers is None else workers
+        self.mode = mode
+        self.batch = batch or 2 * max(self.workers, 1)
+        self.playouts_per_leaf = playouts_per_leaf
+        self.candidates = candidates
+        self.exploration = exploration
+        self.max_moves = max_moves
+        self.rnd = random.Random(seed)
+        self.pool = ProcessPoolExecutor(self.workers) if self.workers else None
+        self.info = None
+
+    def __enter__(self) -> 'MCTS':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+
+    def play(self, cache: 'Cache'):
+        move = self.choose(cache.latest, cache.current_player)
+        cache.receive(move)
+        cache.confirm()
+
+    def choose(self, board: Board, player: int) -> Move:
+        start = time.perf_counter()
+        moves = candidate_moves(board, player, self.candidates)
+        if len(moves) == 1:
+            stats, playouts = {move_key(moves[0].__dict__): (1, 0, moves[0].__dict__)}, 0
+        elif self.pool is None:
+            stats, playouts = tree_job(board_spec(board), player, self.time_limit,
+                                       self.candidates, self.exploration,
+                                       self.max_moves, self.rnd.getrandbits(32))
+        elif self.mode == 'root':
+            stats, playouts = self.root_parallel(board, player)
+        else:
+            stats, playouts = self.leaf_parallel(board, player)
+        visits, wins, best = max(stats.values(), key=lambda s: s[0])
+        elapsed = time.perf_counter() - start
+        rate = playouts / elapsed if elapsed else 0.0
+        self.info = MCTSInfo(Move(**best), visits, playouts, elapsed, self.workers,
+                             rate, rate / max(self.workers, 1))
+        return Move(**best)
+
+    def root_parallel(self, board: Board, player: int):
+        spec = board_spec(board)
+        jobs = [self.pool.submit(tree_job, spec, player, self.time_limit, self.candidates,
+                                 self.exploration, self.max_moves, self.rnd.getrandbits(32))
+                for i in range(self.workers)]
+        stats, playouts = {}, 0
+        for job in jobs:
+            tree_stats, count = job.result()
+            playouts += count
+            for key, (visits, wins, move) in tree_stats.items():
+                total = stats.get(key, (0, 0, move))
+                stats[key] = (total[0] + visits, total[1] + wins, move)
+        return stats, playouts
+
+    def leaf_parallel(self, board: Board, player: int):
+        tree = Tree(board.copy(tracking=False), player, self.candidates,
+                    self.exploration, self.rnd)
+        deadline = time.perf_counter() + self.time_limit
+        count = self.playouts_per_leaf
+        playouts = 0
+        # at least one batch is sent, however short the time limit
+        while not tree.root.children or time.perf_counter() < deadline:
+            pending = []
+            for i in range(self.batch):
+                path, undo = tree.descend()
+                leaf = path[-1]
+                if leaf.terminal():
+                    tree.restore(undo)
+                    tree.backup(path, leaf.player, count)
+                    continue
+                job = self.pool.submit(playout_job, board_spec(tree.board), 3 - leaf.player,
+                                       count, self.max_moves, self.rnd.getrandbits(32))
+                tree.restore(undo)
+                for node in path:
+                    node.virtual += count
+                pending.append((path, job))
+            for path, job in pending:
+                for node in path:
+                    node.virtual -= count
+                tree.backup(path, 0, count, job.result())
+                playouts += count
+        return tree.root_stats(), playouts
@@ -1,4 +1,7 @@
+from collections import OrderedDict
 from model.state import *
+from model import profiling
+from model.variations import VariationTree, Node
 
 class History:
     """
@@ -10,12 +13,17 @@ class History:
 
     ***Remember, if a board is the (i)th state in the board history,
     then the last move done is the (i-1)th action in the move history
+
+    The moves are the main line of the game, any other lines tried
+    are stored in variations, see VariationTree
+    While a game is played, variations is only brought up to date by Cache.store_variations
     """
-    def __init__(self, rows: int, cols: int, base_size: int, moves=None):
+    def __init__(self, rows: int, cols: int, base_size: int, moves=None, variations=None):
         self.rows = rows
         self.cols = cols
         self.base_size = base_size
         self.moves = moves if moves else []
+        self.variations = variations if variations else []
 
     def store(self, move: Move):
         self.moves.append(move.__dict__)
@@ -33,6 +41,85 @@ class History:
             boards.append(Move(**mv)(boards[-1]))
         return boards
 
+    def states(self, interval: int = 32, cache_size: int = 16) -> 'StateStore':
+        """
+        the board states of the game as a StateStore,
+        replayed on a single board instead of copying it for every move
+        """
+        board = Board(self.rows, self.cols, self.base_size)
+        store = StateStore(board, interval, cache_size)
+        for mv in self.moves:
+            store.append(Move(**mv).apply(board), board)
+        return store
+
+class StateStore:
+    """
+    Stores all the board states of a game without keeping a Board for each one
+    To obtain the (i)th Board state, call
+        <store>[i]
+    To add the state reached by a move, call
+        <store>.append(<delta of the move>)
+
+    A copy of the cells is kept as a keyframe every <interval> states,
+    any other state is rebuilt from the keyframe before it by redoing the deltas in between.
+    The <cache_size> most recently requested states are kept as Boards.
+
+    ***The Boards returned are shared and must not be modified
+    """
+    def __init__(self, start: Board, interval: int = 32, cache_size: int = 16):
+        self.template = start.copy(tracking=False)
+        self.interval = interval
+        self.cache_size = cache_size
+        self.keyframes = [bytes(start.cells)]
+        self.deltas = []
+        self.recent = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.deltas) + 1
+
+    def __getitem__(self, i: int) -> Board:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        board = self.recent.get(i)
+        if board is not None:
+            self.recent.move_to_end(i)
+            return board
+        board = self.rebuild(i)
+        self.recent[i] = board
+        if len(self.recent) > self.cache_size:
+            self.recent.popitem(last=False)
+        return board
+
+    def rebuild(self, i: int) -> Board:
+        k = i // self.interval
+        board = self.template.copy()
+        board.set_cells(self.keyframes[k])
+        for delta in self.deltas[k * self.interval:i]:
+            delta.redo(board)
+        return board
+
+    def truncate(self, n: int):
+        """drops the states after the (n)th"""
+        del self.deltas[n:]
+        del self.keyframes[n // self.interval + 1:]
+        for i in [i for i in self.recent if i > n]:
+            del self.recent[i]
+
+    def append(self, delta: Delta, board: Board = None):
+        """
+        stores the state reached from the last state by delta
+        board may be given as that state to avoid rebuilding it for a keyframe
+        """
+        self.deltas.append(delta)
+        i = len(self.deltas)
+        if i % self.interval == 0:
+            if board is None:
+                board = self.rebuild(i - 1)
+                delta.redo(board)
+            self.keyframes.append(bytes(board.cells))
+
 class Cache:
     """
     Stores the current Board state and current player.
@@ -57,11 +144,16 @@ class Cache:
     """
     def __init__(self, history: History):
         self.hist = history
-        self.save = history.board_history()
+        self.save = history.states()
         self.nstate = len(self.save) - 1
         self.current_player = self.nstate % 2 + 1
         self.latest = self.save[-1].copy()
-        self.move = None 
+        self.latest.track_conquest()
+        self.move = None
+        self.delta = None
+        # every line of play, sharing the deltas of the states
+        self.tree = VariationTree.from_deltas(history.moves, self.save.deltas)
+        self.tree.extend(self.latest, history.variations)
 
     def link_gui(self, controller: 'Controller', boardview: 'Boardview'):
         self.controller = controller
@@ -97,26 +189,80 @@ class Cache:
         self.boardview.set_view(self.save[self.nstate])
         self.send_turn_status()
 
+    @profiling.instrumented('receive', lambda cache, move: {'type': move.type, 'player': move.player})
     def receive(self, move: Move):
         if self.move or self.hist.is_finished():
             return
-        self.latest = move(self.latest, validate=True)
+        self.delta = move.apply(self.latest, validate=True)
+        self.boardview.set_view(self.latest)
+        self.move = move
+
+    @profiling.instrumented('accept', lambda cache, move, delta: {'type': move.type, 'player': move.player})
+    def accept(self, move: Move, delta: Delta):
+        """
+        like receive, for a move already applied to a copy of the latest board
+        with delta as the result, such as a preview worked out on another thread
+        """
+        if self.move or self.hist.is_finished():
+            return
+        delta.redo(self.latest)
+        self.delta = delta
         self.boardview.set_view(self.latest)
         self.move = move
 
     def discard_change(self):
-        self.latest = self.save[-1]
+        if self.move:
+            self.move.revert(self.latest, self.delta)
         self.boardview.set_view(self.latest)
         self.move = None
+        self.delta = None
 
+    @profiling.instrumented('confirm')
     def confirm(self):
         if not self.move:
             return
-        self.save.append(self.latest)
+        self.save.append(self.delta, self.latest)
         self.hist.store(self.move)
+        self.tree.main = self.tree.add(self.tree.main, self.hist.moves[-1], self.delta)
         self.nstate += 1
         self.current_player = 3 - self.current_player
         if self.move.type == 'Q':
             self.controller.game_won()
         self.send_turn_status()
         self.move = None
+        self.delta = None
+
+    def store_variations(self):
+        """
+        stores the lines of play off the main line in the History, to be saved with it
+        this walks the whole tree, so it is left until the game is saved
+        """
+        self.hist.variations = self.tree.variations()
+
+    def branch(self):
+        """
+        continues the game from the state being played back,
+        keeping the moves after it as a variation
+        """
+        if self.move or self.at_last_state():
+            return
+        self.switch(self.tree.path(self.tree.main)[self.nstate - 1]
+                    if self.nstate else self.tree.root)
+
+    def switch(self, node: Node):
+        """makes the line of play leading to node the main line of the game"""
+        if self.move:
+            return
+        tree = self.tree
+        top = tree.common(tree.main, node)
+        tree.walk(self.latest, tree.main, node)
+        self.save.truncate(top.depth)
+        del self.hist.moves[top.depth:]
+        for n in tree.path(node)[top.depth:]:
+            self.save.append(n.delta)
+            self.hist.moves.append(n.move)
+        tree.main = node
+        self.nstate = len(self.save) - 1
+        self.current_player = self.nstate % 2 + 1
+        self.boardview.set_view(self.latest)
+        self.send_turn_status()
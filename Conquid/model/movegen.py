@@ -0,0 +1,115 @@
+"""
+Enumeration of the legal moves of a player, for bots and analysis tools
+None of these functions modify the board or rely on InvalidMove being raised
+"""
+
+from itertools import combinations
+from math import comb
+from model.state import Board, Move, Position, PLAYER
+from model.evaluate import UNREACHABLE, distance_map, approach_map
+
+# number of cells taken by one acquire move, as in the AcquireHandler
+ACQUIRE_CELLS = 3
+
+
+def empty_cells(board: Board) -> [Position]:
+    board.require_dense('empty_cells')
+    return [board.position(idx) for idx, code in enumerate(board.cells)
+            if code & PLAYER == 0]
+
+
+def acquire_moves(board: Board, player: int, cells: [Position] = None):
+    """
+    yields every Acquire of ACQUIRE_CELLS empty cells, one at a time
+    cells may restrict the choice to a subset of the empty cells
+    """
+    if cells is None:
+        cells = empty_cells(board)
+    for locs in combinations(cells, ACQUIRE_CELLS):
+        yield Move('A', player, locs=list(locs))
+
+
+def count_acquire_moves(board: Board) -> int:
+    return comb(len(empty_cells(board)), ACQUIRE_CELLS)
+
+
+def vanquish_corners(board: Board, player: int) -> [Position]:
+    """the upper-left corners of every square the player may vanquish"""
+    return board.vanquish_corners(player)
+
+
+def vanquish_moves(board: Board, player: int) -> [Move]:
+    return [Move('V', player, corner=corner)
+            for corner in vanquish_corners(board, player)]
+
+
+def can_conquer(board: Board, player: int) -> bool:
+    """
+    whether a conquer would change the board, that is if some enemy cell
+    already touches 2 of the player's cells
+    """
+    return board.can_conquer(player)
+
+
+def can_conquest(board: Board, player: int) -> bool:
+    return board.can_conquest(player)
+
+
+def legal_moves(board: Board, player: int):
+    """
+    yields every legal move of the player that changes the board:
+    conquest, conquer, vanquishes, then acquires
+    """
+    if can_conquest(board, player):
+        yield Move('Q', player)
+    if can_conquer(board, player):
+        yield Move('C', player)
+    yield from vanquish_moves(board, player)
+    yield from acquire_moves(board, player)
+
+
+def candidate_moves(board: Board, player: int, candidates: int = 6) -> [Move]:
+    """
+    a short list of the moves most worth trying, for searches that cannot
+    afford every Acquire: conquest alone if it is available, otherwise
+    conquer if it changes anything, every vanquish, and the Acquires
+    of the <candidates> empty cells given by acquire_candidates
+    """
+    if board.can_conquest(player):
+        return [Move('Q', player)]
+    moves = []
+    if can_conquer(board, player):
+        moves.append(Move('C', player))
+    moves.extend(vanquish_moves(board, player))
+    cells = acquire_candidates(board, player, candidates)
+    moves.extend(Move('A', player, locs=[board.position(idx) for idx in locs])
+                 for locs in combinations(cells, ACQUIRE_CELLS))
+    if not moves:
+        # nothing changes the board, pass with a conquer
+        moves.append(Move('C', player))
+    return moves
+
+
+def acquire_candidates(board: Board, player: int, count: int) -> [int]:
+    """
+    the flat indices of the <count> empty cells lying on or closest to
+    a shortest path to conquest, alternating between the player's paths and the enemy's
+    """
+    cells = board.cells
+    ranked = []
+    for side in (player, 3 - player):
+        fwd = distance_map(board, side)
+        back = approach_map(board, side)
+        scores = [(fwd[idx] + back[idx], idx) for idx, code in enumerate(cells)
+                  if code & PLAYER == 0 and fwd[idx] < UNREACHABLE]
+        scores.sort()
+        ranked.append([idx for score, idx in scores[:count]])
+    chosen = []
+    for pair in zip(*ranked):
+        for idx in pair:
+            if idx not in chosen:
+                chosen.append(idx)
+    for idx in ranked[0] + ranked[1]:
+        if idx not in chosen:
+            chosen.append(idx)
+    return chosen[:count]
@@ -0,0 +1,158 @@
+"""
+Message protocol between the game server and its clients, see server.py
+
+Every message is framed as
+    length      little endian uint32, the size of everything after it
+    kind        one byte naming the message
+    body        the fields of the message
+
+Requests from a client, answered in order:
+    NEW     rows, cols, base size               -> GAME with the new game id
+    JOIN    game id                             -> STATE, and DELTA for every later move
+    LEAVE   game id                             -> STATE
+    PLAY    game id, move record                -> ACK with the number of moves played
+any request may instead be answered with ERROR, holding the game id and a message.
+
+Pushed to the subscribers of a game:
+    DELTA   game id, move number, move record, cell count, then
+            the flat indices and new codes of the cells changed
+
+Move records are the fixed width records of savefile.MOVE
+"""
+
+import asyncio
+import struct
+from array import array
+from model.savefile import MOVE, encode_move, decode_move
+
+FRAME = struct.Struct('<I')
+NEW, GAME, JOIN, LEAVE, STATE, PLAY, ACK, DELTA, ERROR = b'NGJLSPKDE'
+NEW_BODY = struct.Struct('<HHB')
+GAME_ID = struct.Struct('<I')
+STATE_BODY = struct.Struct('<IHHBI')
+ACK_BODY = struct.Struct('<II')
+DELTA_HEAD = struct.Struct('<II' + MOVE.format[1:] + 'I')
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def frame(kind: int, body: bytes = b'') -> bytes:
+    return FRAME.pack(len(body) + 1) + bytes((kind,)) + body
+
+
+async def read_message(reader: asyncio.StreamReader) -> (int, bytes):
+    """the kind and body of the next message, raises IncompleteReadError at the end"""
+    size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if size == 0:
+        raise ProtocolError('empty message')
+    data = await reader.readexactly(size)
+    return data[0], data[1:]
+
+
+def move_body(game: int, mv: dict) -> bytes:
+    return GAME_ID.pack(game) + encode_move(mv)
+
+
+def parse_move(body: bytes) -> (int, dict):
+    if len(body) != GAME_ID.size + MOVE.size:
+        raise ProtocolError('bad move message')
+    game, = GAME_ID.unpack_from(body)
+    return game, decode_move(body[GAME_ID.size:])
+
+
+def delta_body(game: int, number: int, mv: dict, delta) -> bytes:
+    index = array('I', delta.index)
+    return DELTA_HEAD.pack(game, number, *MOVE.unpack(encode_move(mv)), len(index)) + \
+        index.tobytes() + delta.new
+
+
+def parse_delta(body: bytes) -> (int, int, dict, array, bytes):
+    """game id, move number, move, flat indices and new codes of a DELTA"""
+    game, number, *record, n = DELTA_HEAD.unpack_from(body)
+    mv = decode_move(MOVE.pack(*record))
+    start = DELTA_HEAD.size
+    index = array('I')
+    index.frombytes(body[start:start + 4 * n])
+    return game, number, mv, index, body[start + 4 * n:start + 5 * n]
+
+
+def state_body(game: int, rows: int, cols: int, base_size: int, moves: int,
+               cells: bytes) -> bytes:
+    return STATE_BODY.pack(game, rows, cols, base_size, moves) + bytes(cells)
+
+
+def parse_state(body: bytes) -> (int, int, int, int, int, bytes):
+    """game id, rows, cols, base size, number of moves and cells of a STATE"""
+    return STATE_BODY.unpack_from(body) + (body[STATE_BODY.size:],)
+
+
+class Client:
+    """
+    A connection to the game server
+    Requests are awaited for their reply, while DELTA messages of joined games
+    are passed to on_delta(<game>, <number>, <move>, <indices>, <codes>)
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 on_delta=None):
+        self.reader = reader
+        self.writer = writer
+        self.on_delta = on_delta
+        self.replies = asyncio.Queue()
+        self.listener = asyncio.ensure_future(self.listen())
+
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = 7878, path: str = None,
+                      on_delta=None) -> 'Client':
+        """connects over TCP, or to the Unix socket at path if given"""
+        if path:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, on_delta)
+
+    async def listen(self):
+        try:
+            while True:
+                kind, body = await read_message(self.reader)
+                if kind == DELTA:
+                    if self.on_delta is not None:
+                        self.on_delta(*parse_delta(body))
+                else:
+                    self.replies.put_nowait((kind, body))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.replies.put_nowait((None, b''))
+
+    async def request(self, kind: int, body: bytes, expect: int) -> bytes:
+        self.writer.write(frame(kind, body))
+        reply, body = await self.replies.get()
+        if reply == ERROR:
+            raise ProtocolError(body[GAME_ID.size:].decode())
+        if reply != expect:
+            raise ProtocolError('connection closed' if reply is None else
+                                f'unexpected reply {bytes((reply,))!r}')
+        return body
+
+    async def new_game(self, rows: int, cols: int, base_size: int) -> int:
+        body = await self.request(NEW, NEW_BODY.pack(rows, cols, base_size), GAME)
+        return GAME_ID.unpack(body)[0]
+
+    async def join(self, game: int) -> tuple:
+        return parse_state(await self.request(JOIN, GAME_ID.pack(game), STATE))
+
+    async def leave(self, game: int) -> tuple:
+        return parse_state(await self.request(LEAVE, GAME_ID.pack(game), STATE))
+
+    async def move(self, game: int, mv: dict) -> int:
+        """plays mv, given like History.moves, returning the number of moves played"""
+        body = await self.request(PLAY, move_body(game, mv), ACK)
+        return ACK_BODY.unpack(body)[1]
+
+    async def close(self):
+        self.writer.close()
+        self.listener.cancel()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
@@ -0,0 +1,226 @@
+"""
+Binary save format for a History
+
+    header      MAGIC, version, rows, cols, base size, move count, keyframe interval
+    moves       one fixed width record per move:
+                type, player, number of positions, then up to 3 positions
+                (3 acquired cells, the vanquish corner, or none)
+    keyframes   if the interval is not 0, the cells of every <interval>th
+                board state, starting from the first, as one byte per cell
+    variations  only if the game has any, VARIATIONS_MAGIC, their count,
+                then for each the number of its parent node and a move record,
+                see VariationTree
+
+All integers are little endian, so move k and keyframe k can be
+read at a fixed offset without parsing the rest of the file.
+"""
+
+import json
+import mmap
+import struct
+from model.state import Board, Move
+from model.memory import History
+
+MAGIC = b'CQDH'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHBxII')
+MOVE = struct.Struct('<cBBx6H')
+MAX_LOCS = 3
+VARIATIONS_MAGIC = b'CQDV'
+VARIATION = struct.Struct('<I')
+COUNT = struct.Struct('<I')
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+def encode_move(mv: dict) -> bytes:
+    if mv['type'] == 'A':
+        locs = mv['locs']
+    elif mv['type'] == 'V':
+        locs = [mv['corner']]
+    else:
+        locs = []
+    if len(locs) > MAX_LOCS:
+        raise SaveFormatError(f'cannot save a move with more than {MAX_LOCS} positions')
+    coords = [x for loc in locs for x in loc]
+    coords += [0] * (2 * MAX_LOCS - len(coords))
+    return MOVE.pack(mv['type'].encode(), mv['player'], len(locs), *coords)
+
+
+def decode_move(record) -> dict:
+    type, player, n, *coords = MOVE.unpack(record)
+    type = type.decode()
+    mv = {'type': type, 'player': player}
+    locs = [(coords[2 * k], coords[2 * k + 1]) for k in range(n)]
+    if type == 'A':
+        mv['locs'] = locs
+    elif type == 'V':
+        mv['corner'] = locs[0]
+    return mv
+
+
+def dump(history: History, fp, interval: int = 32):
+    """
+    writes history to the binary file object fp,
+    with a keyframe every <interval> states, or none if interval is 0
+    """
+    fp.write(HEADER.pack(MAGIC, VERSION, history.rows, history.cols,
+                         history.base_size, len(history.moves), interval))
+    for mv in history.moves:
+        fp.write(encode_move(mv))
+    if interval:
+        board = Board(history.rows, history.cols, history.base_size)
+        fp.write(board.cells)
+        for k, mv in enumerate(history.moves, 1):
+            Move(**mv).execute(board)
+            if k % interval == 0:
+                fp.write(board.cells)
+    if history.variations:
+        fp.write(VARIATIONS_MAGIC + COUNT.pack(len(history.variations)))
+        for parent, mv in history.variations:
+            fp.write(VARIATION.pack(parent) + encode_move(mv))
+
+
+def load(fp) -> History:
+    """reads a History from the binary file object fp, one move at a time"""
+    rows, cols, base_size, nmoves, interval = read_header(fp.read(HEADER.size))
+    history = History(rows, cols, base_size)
+    for k in range(nmoves):
+        record = fp.read(MOVE.size)
+        if len(record) < MOVE.size:
+            raise SaveFormatError('file ends before the last move')
+        history.moves.append(decode_move(record))
+    fp.seek(keyframes_size(rows, cols, nmoves, interval), 1)
+    history.variations = decode_variations(fp.read())
+    return history
+
+
+def keyframes_size(rows: int, cols: int, nmoves: int, interval: int) -> int:
+    return (nmoves // interval + 1) * rows * cols if interval else 0
+
+
+def decode_variations(data: bytes) -> [list]:
+    """the variations stored in data, the end of a file after the keyframes"""
+    if not data:
+        return []
+    if data[:len(VARIATIONS_MAGIC)] != VARIATIONS_MAGIC:
+        raise SaveFormatError('unexpected data after the keyframes')
+    offset = len(VARIATIONS_MAGIC)
+    if len(data) < offset + COUNT.size:
+        raise SaveFormatError('file ends in the variations header')
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    size = VARIATION.size + MOVE.size
+    if len(data) < offset + count * size:
+        raise SaveFormatError('file ends before the last variation')
+    variations = []
+    for k in range(count):
+        parent, = VARIATION.unpack_from(data, offset)
+        start = offset + VARIATION.size
+        variations.append([parent, decode_move(data[start:start + MOVE.size])])
+        offset += size
+    return variations
+
+
+def read_header(data: bytes):
+    if len(data) < HEADER.size:
+        raise SaveFormatError('file too short for a header')
+    magic, version, rows, cols, base_size, nmoves, interval = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise SaveFormatError('not a binary Conquid save')
+    if version != VERSION:
+        raise SaveFormatError(f'unsupported save version {version}')
+    return rows, cols, base_size, nmoves, interval
+
+
+def is_binary(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save(history: History, path: str, interval: int = 32):
+    """saves history to path, as json unless path ends in .cqd"""
+    if path.endswith('.cqd'):
+        with open(path, 'wb') as f:
+            dump(history, f, interval)
+    else:
+        with open(path, 'w') as f:
+            json.dump(history.__dict__, f)
+
+
+def open_history(path: str) -> History:
+    """opens a History saved in either format"""
+    if is_binary(path):
+        with open(path, 'rb') as f:
+            return load(f)
+    with open(path) as f:
+        return History(**json.load(f))
+
+
+class SaveReader:
+    """
+    Random access to a binary save through a memory map
+    To obtain the (k)th move or the (k)th board state, call
+        <reader>.move(k)
+        <reader>.board(k)
+    Neither parses more of the file than it needs.
+    Close the reader when done, or use it in a with statement.
+    """
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.rows, self.cols, self.base_size, self.nmoves, self.interval = \
+            read_header(self.data[:HEADER.size])
+        self.keyframes_start = HEADER.size + self.nmoves * MOVE.size
+
+    def __enter__(self) -> 'SaveReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.nmoves
+
+    def move(self, k: int) -> Move:
+        if not 0 <= k < self.nmoves:
+            raise IndexError(k)
+        offset = HEADER.size + k * MOVE.size
+        return Move(**decode_move(self.data[offset:offset + MOVE.size]))
+
+    def moves(self):
+        """yields every move in order"""
+        for k in range(self.nmoves):
+            yield self.move(k)
+
+    def board(self, k: int) -> Board:
+        """
+        the board after the first k moves,
+        replayed from the nearest keyframe if there are any
+        """
+        if not 0 <= k <= self.nmoves:
+            raise IndexError(k)
+        board = Board(self.rows, self.cols, self.base_size)
+        start = 0
+        if self.interval:
+            frame = k // self.interval
+            size = self.rows * self.cols
+            offset = self.keyframes_start + frame * size
+            board.set_cells(self.data[offset:offset + size])
+            start = frame * self.interval
+        for i in range(start, k):
+            self.move(i).execute(board)
+        return board
+
+    def history(self) -> History:
+        end = self.keyframes_start + keyframes_size(self.rows, self.cols,
+                                                    self.nmoves, self.interval)
+        return History(self.rows, self.cols, self.base_size,
+                       [self.move(k).__dict__ for k in range(self.nmoves)],
+                       decode_variations(self.data[end:]))
@@ -1,9 +1,21 @@
-import math
+from array import array
 from collections import deque
-from heapq import heappush, heappop
+from functools import lru_cache
 from typing import Tuple
+from model.zobrist import zobrist_keys, CODES
+from model import profiling
+try:
+    import numpy as np
+except ImportError:
+    np = None
 Position = Tuple[int,int]
 
+# cell codes stored in a Board buffer
+# the low two bits hold the player and BASE flags a base cell
+PLAYER = 0b011
+BASE = 0b100
+
+
 class Cell:
     """
     stores information about player and base status
@@ -25,6 +37,72 @@ class Cell:
     def copy(self) -> 'Cell':
         return Cell(**self.__dict__)
 
+    @property
+    def code(self) -> int:
+        return self.player | (BASE if self.base else 0)
+
+class CellView:
+    """
+    A live view of a single cell stored in a Board buffer
+    Supports the same interface as Cell, writes go straight to the board
+    """
+    __slots__ = ('board', 'index')
+
+    def __init__(self, board: 'Board', index: int):
+        self.board = board
+        self.index = index
+
+    @property
+    def player(self) -> int:
+        return self.board.cells[self.index] & PLAYER
+
+    @player.setter
+    def player(self, player: int):
+        cells = self.board.cells
+        old = cells[self.index]
+        cells[self.index] = (old & BASE) | player
+        self.board.changed((self.index,), (old,))
+
+    @property
+    def base(self) -> bool:
+        return bool(self.board.cells[self.index] & BASE)
+
+    @base.setter
+    def base(self, base: bool):
+        cells = self.board.cells
+        old = cells[self.index]
+        cells[self.index] = (old & PLAYER) | (BASE if base else 0)
+        self.board.changed((self.index,), (old,))
+
+    @property
+    def code(self) -> int:
+        return self.board.cells[self.index]
+
+    def set_base(self, player: int):
+        old = self.board.cells[self.index]
+        self.board.cells[self.index] = player | BASE
+        self.board.changed((self.index,), (old,))
+
+    def copy(self) -> Cell:
+        return Cell(self.player, self.base)
+
+@lru_cache(maxsize=16)
+def adjacency(rows: int, cols: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    flat indices of the orthogonal neighbours of every cell on a rows x cols board
+    shared by every Board of the same shape
+    """
+    adj = []
+    for i in range(rows):
+        for j in range(cols):
+            nbrs = []
+            for dx, dy in Board.adjacent_offsets:
+                x, y = i + dx, j + dy
+                if 0 <= x < rows and 0 <= y < cols:
+                    nbrs.append(x * cols + y)
+            adj.append(tuple(nbrs))
+    return tuple(adj)
+
 class Board:
     """
     A representation of the state of the game and its transformations
@@ -36,6 +114,9 @@ class Board:
     ***Note that the board is indexed from 0
        so the first coordinate may range from 0 to rows - 1
        and the second coordinate may range from 0 to cols - 1
+
+    The cells are stored row by row in the bytearray <board>.cells,
+    one code per cell made of the player number or'd with the BASE flag
     """
     adjacent_offsets = [(0,1),(0,-1),(1,0),(-1,0)]
     vanquish_offsets = [(i,j) for i in range(4) for j in range(4)]
@@ -45,11 +126,29 @@ class Board:
                          (4,0), (4,1), (4,2), (4,3),
                          (0,-1), (1,-1), (2,-1), (3,-1),
                          (0,4), (1,4), (2,4), (3,4)]
+    # default engine for conquer, see Board.conquer
+    conquer_engine = 'auto'
+    # number of cells from which the 'auto' conquer engine switches to numpy
+    numpy_threshold = 1024
+    # ConquestTracker kept up to date with the board, see Board.track_conquest
+    tracker = None
+    # list collecting every change while a Move is applied, see Move.apply
+    journal = None
+    # threading.Event set to stop the searches of the board with Cancelled, see Controller.preview
+    stop = None
+    # fraction of the cells the frontier of a player may hold before it is dropped
+    frontier_fraction = 1 / 8
 
     def __init__(self, r: int, c: int, base_size: int):
         self.rows = r
         self.cols = c
-        self.grid = [[Cell() for j in range(c)] for i in range(r)]
+        self.allocate()
+        # Zobrist hash of the cells, kept up to date by Board.changed
+        self.zobrist = 0
+        # flat indices changed since each player last reached a fixed point of conquer,
+        # None if unknown and the whole board must be searched, see Board.conquer
+        self.frontier = {1: set(), 2: set()}
+        self.frontier_limit = int(r * c * Board.frontier_fraction)
         self.base_size = base_size
         if base_size == 2:
             self.bases = ((self.rows // 2 - 1, 4), (self.rows // 2 - 1, self.cols - 6))
@@ -58,6 +157,11 @@ class Board:
             self.bases = ((self.rows // 2, 5), (self.rows // 2, self.cols - 6))
             self.make_base3x3()
 
+    def allocate(self):
+        """creates the empty cells and the Zobrist keys of the board"""
+        self.cells = bytearray(self.rows * self.cols)
+        self.zobrist_keys = zobrist_keys(self.rows, self.cols)
+
     def make_base3x3(self):
         for player, center in enumerate(self.bases, 1):
             for dx, dy in Board.base_offsets3x3:
@@ -69,18 +173,101 @@ class Board:
             for dx, dy in Board.base_offsets2x2:
                 self[corner[0] + dx, corner[1] + dy].set_base(player)
 
-    def copy(self) -> 'Board':
-        cpy = Board(self.rows, self.cols, self.base_size)
-        for i in range(self.rows):
-            for j in range(self.cols):
-                cpy[i,j] = self[i,j].copy()
+    def copy(self, tracking: bool = True) -> 'Board':
+        cpy = Board.__new__(Board)
+        cpy.__dict__.update(self.__dict__)
+        cpy.cells = self.cells[:]
+        first, second = self.frontier[1], self.frontier[2]
+        cpy.frontier = {1: None if first is None else first.copy(),
+                        2: None if second is None else second.copy()}
+        if self.tracker is not None:
+            cpy.tracker = self.tracker.copy() if tracking else None
         return cpy
 
-    def __getitem__(self, pos: Position) -> Cell:
-        return self.grid[pos[0]][pos[1]]
+    def track_conquest(self):
+        """
+        attaches a ConquestTracker to the board so can_conquest is answered
+        from incrementally maintained groups instead of a search
+        """
+        from model.connectivity import ConquestTracker
+        if self.tracker is None:
+            self.tracker = ConquestTracker(self)
+
+    def changed(self, idxs: [int], olds: [int]):
+        """
+        reports that the cells at flat indices idxs changed from the codes olds
+        every modification of the cells must be followed by a call to this
+        """
+        keys = self.zobrist_keys
+        cells = self.cells
+        h = self.zobrist
+        for idx, old in zip(idxs, olds):
+            h ^= keys[idx * CODES + old] ^ keys[idx * CODES + cells[idx]]
+        self.zobrist = h
+        if self.journal is not None:
+            self.journal.append((idxs, olds))
+        if self.tracker is not None:
+            self.tracker.update(self, idxs, olds)
+        for player, frontier in self.frontier.items():
+            if frontier is not None:
+                frontier.update(idxs)
+                if len(frontier) > self.frontier_limit:
+                    self.frontier[player] = None
+        if profiling.probe is not None:
+            profiling.probe.count('cells', len(idxs))
+
+    def write(self, idxs: [int], codes: bytes):
+        """sets the cells at flat indices idxs to codes"""
+        cells = self.cells
+        olds = bytes(cells[idx] for idx in idxs)
+        for idx, code in zip(idxs, codes):
+            cells[idx] = code
+        self.changed(idxs, olds)
+
+    def set_cells(self, cells: bytes):
+        """replaces all the cells at once, dropping any tracker"""
+        self.cells = bytearray(cells)
+        self.tracker = None
+        self.frontier = {1: None, 2: None}
+        keys = self.zobrist_keys
+        h = 0
+        for idx, code in enumerate(self.cells):
+            if code:
+                h ^= keys[idx * CODES + code]
+        self.zobrist = h
+
+    def adjacency(self) -> Tuple[Tuple[int, ...], ...]:
+        """the flat indices of the neighbours of every flat index, see adjacency"""
+        return adjacency(self.rows, self.cols)
+
+    def occupied(self):
+        """flat indices including every cell that is not empty"""
+        return range(len(self.cells))
+
+    def require_dense(self, what: str):
+        """
+        checks that what, which visits every cell of the board, can run on it
+        boards storing only the cells in use raise NotImplementedError, see model.chunked
+        """
+
+    def index(self, pos: Position) -> int:
+        return pos[0] * self.cols + pos[1]
+
+    def position(self, index: int) -> Position:
+        return divmod(index, self.cols)
+
+    def __getitem__(self, pos: Position) -> CellView:
+        if not self.is_valid_position(pos):
+            raise IndexError(pos)
+        return CellView(self, pos[0] * self.cols + pos[1])
 
     def __setitem__(self, pos: Position, value: Cell):
-        self.grid[pos[0]][pos[1]] = value
+        if not self.is_valid_position(pos):
+            raise IndexError(pos)
+        idx = pos[0] * self.cols + pos[1]
+        old = self.cells[idx]
+        self.cells[idx] = value.code
+        self.changed((idx,), (old,))
 
     def is_valid_position(self, pos: Position):
         return pos[0] >= 0 and pos[0] < self.rows and pos[1] >= 0 and pos[1] < self.cols
@@ -93,93 +280,321 @@ class Board:
                     yield loc
 
     def acquire(self, player: int, locs: [Position], validate: bool = False):
-        if validate:
-            for loc in locs:
-                if self[loc].player != 0:
-                    raise InvalidMove
-        for loc in locs:
-            self[loc].player = player
-
-    def conquer(self, player: int):
+        if validate and not self.can_acquire(locs):
+            raise InvalidMove()
+        cells = self.cells
+        # a cell listed twice is only acquired once
+        idxs = list(dict.fromkeys(self.index(loc) for loc in locs))
+        olds = [cells[idx] for idx in idxs]
+        for idx in idxs:
+            cells[idx] = (cells[idx] & BASE) | player
+        self.changed(idxs, olds)
+
+    def can_acquire(self, locs: [Position]) -> bool:
+        """whether all of locs are on the board and empty"""
+        return all(self.is_valid_position(loc) and
+                   self.cells[self.index(loc)] & PLAYER == 0 for loc in locs)
+
+    def conquer(self, player: int, engine: str = None):
+        """
+        converts every enemy cell touching 2 or more of the player's cells,
+        repeating until no more cells can be conquered
+
+        engine picks the implementation, defaulting to Board.conquer_engine:
+            'python' runs a breadth first search from the player's frontier
+            'numpy' counts neighbours of whole arrays round by round
+            'auto' uses python while the frontier is known, otherwise
+                   numpy if installed and the board is large enough
+        every engine gives the same result
+
+        A cell can only become conquerable by changing to the enemy's or by having
+        a neighbour change to the player's, and after a conquer no cell is conquerable,
+        so the search starts from the cells changed since the player's last conquer
+        and their neighbours: the player's frontier
+        """
+        engine = engine or Board.conquer_engine
+        if engine == 'auto':
+            engine = 'numpy' if np is not None and self.frontier[player] is None and \
+                len(self.cells) >= Board.numpy_threshold else 'python'
+        if engine == 'python':
+            self.conquer_bfs(player)
+        elif engine == 'numpy':
+            self.conquer_numpy(player)
+        else:
+            raise ValueError(f'unknown conquer engine {engine!r}')
+
+    def conquer_bfs(self, player: int):
         enemy = 3 - player
-        # player cells that touch enemy cell
-        touching = [[0 for j in range(self.cols)] for i in range(self.rows)]
-        # fill queue w player cells
-        q = deque((i,j) for i in range(self.rows) for j in range(self.cols) \
-            if self[i,j].player == player and not self[i,j].base)
+        cells = self.cells
+        adj = self.adjacency()
+        conquered = []
+        if self.frontier[player] is None:
+            # fill queue w player cells, counting the player neighbours of enemy cells as they go
+            q = deque(idx for idx in self.occupied() if cells[idx] == player)
+            touching = {}
+        else:
+            # fill queue w conquerable cells of the frontier
+            q = deque(self.conquerable(player))
+            for idx in q:
+                cells[idx] = player
+            conquered.extend(q)
+            # player neighbours are counted from the board, see below
+            touching = None
+        if profiling.probe is not None:
+            profiling.probe.count('seeds', len(q))
+        stop = self.stop
         # begin teh konker
         while q:
+            if stop is not None and stop.is_set():
+                raise Cancelled()
             # newly conquered cell
             curr = q.popleft()
-            for i, j in self.adjacent(curr):
-                # update neighbour
-                if self[i, j].player == enemy:
-                    touching[i][j] += 1
-                    if touching[i][j] >= 2:
-                        #conquer neighbour
-                        self[i, j].player = player
-                        q.append((i,j))
+            for n in adj[curr]:
+                # update neighbour, base cells are never touched
+                if cells[n] != enemy:
+                    continue
+                if touching is None:
+                    # the counts of cells away from the frontier are not known,
+                    # and cells still in the queue must not be counted twice
+                    count = sum(cells[m] == player for m in adj[n])
+                else:
+                    count = touching.get(n, 0) + 1
+                    touching[n] = count
+                if count >= 2:
+                    #conquer neighbour
+                    cells[n] = player
+                    q.append(n)
+                    conquered.append(n)
+        if profiling.probe is not None:
+            profiling.probe.count('conquered', len(conquered))
+        self.changed(conquered, bytes([enemy]) * len(conquered))
+        self.frontier[player] = set()
+
+    def conquerable(self, player: int) -> [int]:
+        """
+        flat indices of the enemy cells touching 2 or more of the player's cells,
+        looked for only around the player's frontier when it is known
+        """
+        enemy = 3 - player
+        cells = self.cells
+        adj = self.adjacency()
+        frontier = self.frontier[player]
+        if frontier is None:
+            near = self.occupied()
+        else:
+            near = set(frontier)
+            for idx in frontier:
+                near.update(adj[idx])
+        return [idx for idx in near if cells[idx] == enemy and
+                sum(cells[n] == player for n in adj[idx]) >= 2]
+
+    def can_conquer(self, player: int) -> bool:
+        """whether a conquer by the player would change the board"""
+        if self.conquerable(player):
+            return True
+        # nothing to conquer is a fixed point as much as a conquer is
+        self.frontier[player] = set()
+        return False
+
+    def conquer_numpy(self, player: int):
+        if np is None:
+            raise ImportError('the numpy conquer engine requires numpy')
+        grid = self.array()
+        # base cells have the BASE bit set so never equal a bare player
+        mine = grid == player
+        enemy = grid == 3 - player
+        before = enemy.copy()
+        touching = np.empty(grid.shape, dtype=np.uint8)
+        while True:
+            if self.stop is not None and self.stop.is_set():
+                raise Cancelled()
+            if profiling.probe is not None:
+                profiling.probe.count('rounds')
+            # count non-base player neighbours of every cell
+            touching.fill(0)
+            touching[1:] += mine[:-1]
+            touching[:-1] += mine[1:]
+            touching[:, 1:] += mine[:, :-1]
+            touching[:, :-1] += mine[:, 1:]
+            conquered = enemy & (touching >= 2)
+            if not conquered.any():
+                break
+            mine |= conquered
+            enemy &= ~conquered
+        conquered = np.flatnonzero(before & mine).tolist()
+        if profiling.probe is not None:
+            profiling.probe.count('conquered', len(conquered))
+        grid[mine] = player
+        self.changed(conquered, bytes([3 - player]) * len(conquered))
+        self.frontier[player] = set()
+
+    def array(self) -> 'np.ndarray':
+        """
+        a rows x cols uint8 numpy view sharing memory with the board cells
+        """
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.rows, self.cols)
 
     def vanquish(self, player: int, corner: Position, validate: bool = False):
-        #check that player surrounds square
-        if validate:
-            surrounding = 0
-            for dx, dy in Board.vanquish_surround:
-                loc = (corner[0] + dx, corner[1] + dy)
-                if self.is_valid_position(loc):
-                    cell = self[loc]
-                    if not cell.base and cell.player == player:
-                        surrounding += 1
-            if surrounding < 4:
-                raise InvalidMove()
-        # check that square is filled with enemy
-        square_player = self[corner].player
-        square = []
-        for dx, dy in Board.vanquish_offsets:
-            loc = (corner[0] + dx, corner[1] + dy)
-            if validate:
-                if not self.is_valid_position(loc) or \
-                    self[loc].base or \
-                    self[loc].player != square_player:
-                    raise InvalidMove()
-            square.append(self[loc])
+        if validate and not self.can_vanquish(player, corner):
+            raise InvalidMove()
+        cells = self.cells
+        square = [self.index((corner[0] + dx, corner[1] + dy))
+                  for dx, dy in Board.vanquish_offsets]
         # delete square
-        for sq in square:
-            sq.player = 0
+        olds = [cells[idx] for idx in square]
+        for idx in square:
+            cells[idx] &= BASE
+        self.changed(square, olds)
+
+    def can_vanquish(self, player: int, corner: Position) -> bool:
+        """
+        whether the player may vanquish the 4x4 square with the upper-left corner:
+        the square lies on the board, holds no base and only one player's cells (or none),
+        and at least 4 of the 16 cells bordering its sides are the player's
+        """
+        r, c = corner
+        rows, cols = self.rows, self.cols
+        if not (0 <= r <= rows - 4 and 0 <= c <= cols - 4):
+            return False
+        cells = self.cells
+        #check that player surrounds square
+        surrounding = 0
+        for dx, dy in Board.vanquish_surround:
+            x, y = r + dx, c + dy
+            if 0 <= x < rows and 0 <= y < cols and cells[x * cols + y] == player:
+                surrounding += 1
+        if surrounding < 4:
+            return False
+        # check that square is filled with one player
+        square_player = cells[r * cols + c] & PLAYER
+        return all(cells[(r + dx) * cols + c + dy] == square_player
+                   for dx, dy in Board.vanquish_offsets)
+
+    def vanquish_corners(self, player: int) -> [Position]:
+        """the upper-left corners of every square the player may vanquish, see VanquishIndex"""
+        from model.vanquish import VanquishIndex
+        return VanquishIndex(self).corners(player)
 
     def conquest(self, player: int):
-        enemy = 3-player
-        # distance to player base
-        dist = [[math.inf for j in range(self.cols)] for i in range(self.rows)]
-        # is distance fixed
-        visited = [[False for j in range(self.cols)] for i in range(self.rows)]
-        # path from player base
-        prev = [[None for j in range(self.cols)] for i in range(self.rows)]
-
-        i, j = self.bases[player-1]
-        start = (i,j)
-        dist[i][j] = 0
-        pq = [(0, start)]
-
-        while pq:
-            # current least-distance cell
-            pathlen, curr = heappop(pq)
-            visited[curr[0]][curr[1]] = True
-            for i, j in self.adjacent(curr, base=True):
-                if not visited[i][j] and self[i, j].player == player:
-                    #update unvisited neighbours for shorter path
-                    if dist[i][j] > pathlen + 1:
-                        prev[i][j] = curr
-                        dist[i][j] = pathlen + 1
-                        heappush(pq, (dist[i][j], (i, j)))
+        path = self.conquest_path(player)
+        # no path found
+        if path is None:
+            raise InvalidMove()
+        olds = [self.cells[idx] for idx in path]
+        for idx in path:
+            self.cells[idx] |= BASE
+        self.changed(path, olds)
+
+    def conquest_path(self, player: int) -> [int]:
+        """
+        flat indices of a shortest chain of player cells linking the player base
+        to a cell touching the enemy base, or None if there is no such chain
+        the starting base cell is not included
+        """
+        enemy_base = (3 - player) | BASE
+        cells = self.cells
+        adj = self.adjacency()
+        start = self.index(self.bases[player-1])
+        # path from player base, -1 if unvisited
+        prev = array('l', [-1]) * len(cells)
+        prev[start] = start
+        q = deque((start,))
+        stop = self.stop
+        while q:
+            if stop is not None and stop.is_set():
+                raise Cancelled()
+            curr = q.popleft()
+            for n in adj[curr]:
+                code = cells[n]
+                if prev[n] < 0 and code & PLAYER == player:
+                    prev[n] = curr
+                    q.append(n)
                 # trace path if found
-                if self[i, j].base and self[i, j].player == enemy:
+                if code == enemy_base:
+                    if profiling.probe is not None:
+                        profiling.probe.count('visited', len(prev) - prev.count(-1))
+                    path = []
                     while curr != start:
-                        self[curr].base = True
-                        curr = prev[curr[0]][curr[1]]
-                    return
-        # no path found
-        raise InvalidMove()
+                        path.append(curr)
+                        curr = prev[curr]
+                    return path
+        if profiling.probe is not None:
+            profiling.probe.count('visited', len(prev) - prev.count(-1))
+        return None
+
+    def can_conquest(self, player: int) -> bool:
+        """
+        whether the player may declare conquest, without modifying the board
+        answered by the tracker if there is one, otherwise
+        floods the player's cells from their base as a bitboard
+        """
+        if self.tracker is not None:
+            return self.tracker.can_conquest(self, player)
+        width = self.cols + 1
+        mine = self.bitboard(player, player | BASE)
+        target = self.bitboard((3 - player) | BASE)
+        r, c = self.bases[player-1]
+        reach = 1 << (self.rows * width - 2 - r * width - c)
+        while True:
+            near = reach << 1 | reach >> 1 | reach << width | reach >> width
+            if near & target:
+                return True
+            grown = reach | near & mine
+            if grown == reach:
+                return False
+            reach = grown
+
+    def bitboard(self, *codes: int) -> int:
+        """
+        an int with a bit set for every cell holding one of the codes
+        each row is followed by a clear guard bit, so the neighbours of bit k
+        are the bits k +- 1 and k +- (cols + 1)
+        """
+        table = bytearray(b'0') * 256
+        for code in codes:
+            table[code] = ord('1')
+        bits = self.cells.translate(table)
+        cols = self.cols
+        return int(b'0'.join(bits[i:i + cols] for i in range(0, len(bits), cols)), 2)
+
+class Delta:
+    """
+    The cells changed by applying a Move to a Board:
+    their flat indices with their codes before and after the move
+    Reverting the delta restores the board to its state before the move,
+    redoing it applies the move again without any search
+    """
+    __slots__ = ('index', 'old', 'new')
+
+    def __init__(self, index: array, old: bytes, new: bytes):
+        self.index = index
+        self.old = old
+        self.new = new
+
+    @classmethod
+    def from_journal(cls, board: Board, journal: list) -> 'Delta':
+        # keep the first old code of cells changed more than once
+        olds = {}
+        for idxs, codes in journal:
+            for idx, code in zip(idxs, codes):
+                olds.setdefault(idx, code)
+        olds = {idx: code for idx, code in olds.items() if board.cells[idx] != code}
+        index = array('l', olds)
+        return cls(index, bytes(olds.values()), bytes(board.cells[idx] for idx in index))
+
+    @classmethod
+    def empty(cls) -> 'Delta':
+        """the delta of a move changing no cell, such as a conquer passing the turn"""
+        return cls(array('l'), b'', b'')
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def revert(self, board: Board):
+        board.write(self.index, self.old)
+
+    def redo(self, board: Board):
+        board.write(self.index, self.new)
 
 class Move:
     """
@@ -209,17 +624,49 @@ class Move:
         if type == 'V':
             self.corner = corner
 
+    @profiling.instrumented('move', lambda move, board, **kwargs:
+                            {'type': move.type, 'player': move.player})
     def __call__(self, board: Board, *, validate=False):
         b = board.copy()
+        self.execute(b, validate=validate)
+        return b
+
+    def execute(self, board: Board, *, validate=False):
         if self.type == 'A':
-            b.acquire(self.player, self.locs, validate=validate)
+            board.acquire(self.player, self.locs, validate=validate)
         elif self.type == 'C':
-            b.conquer(self.player)
+            board.conquer(self.player)
         elif self.type == 'V':
-            b.vanquish(self.player, self.corner, validate=validate)
+            board.vanquish(self.player, self.corner, validate=validate)
         elif self.type == 'Q':
-            b.conquest(self.player)
-        return b
+            board.conquest(self.player)
+
+    @profiling.instrumented('move', lambda move, board, **kwargs:
+                            {'type': move.type, 'player': move.player})
+    def apply(self, board: Board, *, validate=False) -> Delta:
+        """
+        executes the move on board itself instead of a copy
+        returns the Delta with which the move can be reverted
+        """
+        board.journal = journal = []
+        try:
+            self.execute(board, validate=validate)
+        finally:
+            board.journal = None
+        return Delta.from_journal(board, journal)
+
+    @staticmethod
+    def revert(board: Board, delta: Delta):
+        """undoes the move that produced delta on board"""
+        delta.revert(board)
+
+def move_key(mv: dict) -> tuple:
+    """a hashable identity for a move given like History.moves, or the __dict__ of a Move"""
+    return (mv['type'], mv['player'], tuple(map(tuple, mv.get('locs') or ())),
+            tuple(mv.get('corner') or ()))
 
 class InvalidMove(Exception):
     pass
+
+class Cancelled(Exception):
+    """raised by a search of a board when its stop event is set"""
@@ -0,0 +1,118 @@
+"""
+Summed-area tables answering vanquish legality for every corner in O(1)
+See Board.can_vanquish for the rules being checked
+"""
+
+from model.state import Board, Position, BASE, np
+
+# planes of the board counted by the tables
+EMPTY_PLANE, P1_PLANE, P2_PLANE, BASE_PLANE = 0, 1, 2, 3
+
+
+class VanquishIndex:
+    """
+    Prefix sums over a padded copy of the board of the cells of player 1,
+    of player 2 (both without bases), of empty cells and of base cells
+
+    To check one corner or to get every legal corner, call
+        <index>.can_vanquish(<player>, <corner>)
+        <index>.corners(<player>)
+    With numpy installed,
+        <index>.legal_mask(<player>)
+    gives a (rows - 3) x (cols - 3) boolean array of the legal corners in one pass.
+
+    ***The index is a snapshot, build a new one after the board changes
+    """
+    def __init__(self, board: Board):
+        board.require_dense('VanquishIndex')
+        self.rows = board.rows
+        self.cols = board.cols
+        if np is not None:
+            self.sums = self.numpy_sums(board)
+        else:
+            self.sums = self.python_sums(board)
+
+    @staticmethod
+    def numpy_sums(board: Board):
+        grid = board.array()
+        # one ring of padding so the cells bordering the board count as nothing
+        planes = np.zeros((4, board.rows + 2, board.cols + 2), dtype=np.int32)
+        planes[:, 1:-1, 1:-1] = (grid == 0, grid == 1, grid == 2, (grid & BASE) != 0)
+        sums = np.zeros((4, board.rows + 3, board.cols + 3), dtype=np.int32)
+        sums[:, 1:, 1:] = planes.cumsum(1).cumsum(2)
+        return sums
+
+    @staticmethod
+    def python_sums(board: Board):
+        rows, cols = board.rows, board.cols
+        cells = board.cells
+        sums = []
+        for plane in range(4):
+            sat = [[0] * (cols + 3) for i in range(rows + 3)]
+            for i in range(rows + 2):
+                above, row = sat[i], sat[i + 1]
+                acc = 0
+                for j in range(cols + 2):
+                    if 0 < i <= rows and 0 < j <= cols:
+                        code = cells[(i - 1) * cols + j - 1]
+                        if plane == BASE_PLANE:
+                            acc += code & BASE != 0
+                        else:
+                            acc += code == plane
+                    row[j + 1] = above[j + 1] + acc
+            sums.append(sat)
+        return sums
+
+    def count(self, plane: int, top: int, left: int, height: int, width: int) -> int:
+        """cells of plane in the box with the upper-left position (top, left), which may be off the board by 1"""
+        sat = self.sums[plane]
+        bottom, right = top + height + 1, left + width + 1
+        return int(sat[bottom][right] - sat[top + 1][right]
+                   - sat[bottom][left + 1] + sat[top + 1][left + 1])
+
+    def surrounding(self, player: int, corner: Position) -> int:
+        r, c = corner
+        ring = self.count(player, r - 1, c - 1, 6, 6) - self.count(player, r, c, 4, 4)
+        for x, y in ((r - 1, c - 1), (r - 1, c + 4), (r + 4, c - 1), (r + 4, c + 4)):
+            ring -= self.count(player, x, y, 1, 1)
+        return ring
+
+    def can_vanquish(self, player: int, corner: Position) -> bool:
+        r, c = corner
+        if not (0 <= r <= self.rows - 4 and 0 <= c <= self.cols - 4):
+            return False
+        if self.count(BASE_PLANE, r, c, 4, 4):
+            return False
+        if not any(self.count(plane, r, c, 4, 4) == 16
+                   for plane in (EMPTY_PLANE, P1_PLANE, P2_PLANE)):
+            return False
+        return self.surrounding(player, corner) >= 4
+
+    def corners(self, player: int) -> [Position]:
+        if np is not None:
+            return [tuple(pos) for pos in np.argwhere(self.legal_mask(player)).tolist()]
+        return [(i, j) for i in range(self.rows - 3) for j in range(self.cols - 3)
+                if self.can_vanquish(player, (i, j))]
+
+    def legal_mask(self, player: int) -> 'np.ndarray':
+        if np is None:
+            raise ImportError('legal_mask requires numpy')
+        h, w = self.rows - 3, self.cols - 3
+        if h <= 0 or w <= 0:
+            return np.zeros((max(h, 0), max(w, 0)), dtype=bool)
+        sums = self.sums
+
+        def boxes(plane, top, left, height, width):
+            # box sums for every corner, offsets relative to the corner
+            sat = sums[plane]
+            t, l = top + 1, left + 1
+            b, r = t + height, l + width
+            return (sat[b:b + h, r:r + w] - sat[t:t + h, r:r + w]
+                    - sat[b:b + h, l:l + w] + sat[t:t + h, l:l + w])
+
+        uniform = (boxes(EMPTY_PLANE, 0, 0, 4, 4) == 16) | \
+            (boxes(P1_PLANE, 0, 0, 4, 4) == 16) | (boxes(P2_PLANE, 0, 0, 4, 4) == 16)
+        ring = boxes(player, -1, -1, 6, 6) - boxes(player, 0, 0, 4, 4)
+        for x, y in ((-1, -1), (-1, 4), (4, -1), (4, 4)):
+            ring -= boxes(player, x, y, 1, 1)
+        return uniform & (boxes(BASE_PLANE, 0, 0, 4, 4) == 0) & (ring >= 4)
@@ -0,0 +1,133 @@
+"""
+Every line of play tried in a game, kept as a tree of moves
+
+Nodes keep only the Delta of their move against their parent's board, so all
+lines share the storage of the moves they have in common, and a board is carried
+from one node to any other by reverting and redoing the deltas in between.
+"""
+
+from model.state import Board, Move, Delta, move_key
+
+
+class Node:
+    """A board state of the tree, reached from its parent by move"""
+    __slots__ = ('parent', 'move', 'delta', 'children', 'depth')
+
+    def __init__(self, parent: 'Node' = None, move: dict = None, delta: Delta = None):
+        self.parent = parent
+        self.move = move
+        self.delta = delta
+        self.children = []
+        self.depth = parent.depth + 1 if parent else 0
+
+
+class VariationTree:
+    """
+    The tree of the moves of a game from its starting board
+    The line followed by the History of the game ends at <tree>.main
+    To add the state reached from a node by a move applied with delta, call
+        <tree>.add(<node>, <move>, <delta>)
+    To carry a board showing one node to another, call
+        VariationTree.walk(<board>, <from node>, <to node>)
+
+    In History.variations the tree is stored as one [parent, move] pair
+    per node off the main line: node i is the state after i moves of the main line
+    for i up to the number of moves, and the following numbers are the pairs in order.
+    """
+    def __init__(self):
+        self.root = Node()
+        self.main = self.root
+
+    @classmethod
+    def from_deltas(cls, moves: [dict], deltas: [Delta]) -> 'VariationTree':
+        """the tree of a single line of play"""
+        tree = cls()
+        for mv, delta in zip(moves, deltas):
+            tree.main = tree.add(tree.main, mv, delta)
+        return tree
+
+    def add(self, node: Node, mv: dict, delta: Delta) -> Node:
+        """the child of node reached by mv, created unless mv was played there before"""
+        key = move_key(mv)
+        for child in node.children:
+            if move_key(child.move) == key:
+                return child
+        child = Node(node, mv, delta)
+        node.children.append(child)
+        return child
+
+    def path(self, node: Node) -> [Node]:
+        """the nodes from the root, excluded, down to node"""
+        path = []
+        while node.parent is not None:
+            path.append(node)
+            node = node.parent
+        path.reverse()
+        return path
+
+    def line(self, node: Node = None) -> [dict]:
+        """the moves leading to node, by default the main line"""
+        return [n.move for n in self.path(node or self.main)]
+
+    @staticmethod
+    def common(a: Node, b: Node) -> Node:
+        """the deepest node both a and b descend from"""
+        while a.depth > b.depth:
+            a = a.parent
+        while b.depth > a.depth:
+            b = b.parent
+        while a is not b:
+            a, b = a.parent, b.parent
+        return a
+
+    @staticmethod
+    def walk(board: Board, src: Node, dst: Node):
+        """changes board from the state of src to that of dst, touching only the cells that differ"""
+        top = VariationTree.common(src, dst)
+        while src is not top:
+            src.delta.revert(board)
+            src = src.parent
+        down = []
+        while dst is not top:
+            down.append(dst)
+            dst = dst.parent
+        for node in reversed(down):
+            node.delta.redo(board)
+
+    def nodes(self):
+        """yields every node but the root, parents before children"""
+        stack = list(reversed(self.root.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def leaves(self) -> [Node]:
+        """the last node of every line of play"""
+        return [node for node in self.nodes() if not node.children]
+
+    def variations(self) -> [list]:
+        """the nodes off the main line as [parent, move] pairs, see the class description"""
+        numbers = {id(node): i for i, node in enumerate([self.root] + self.path(self.main))}
+        pairs = []
+        for node in self.nodes():
+            if id(node) not in numbers:
+                numbers[id(node)] = len(numbers)
+                pairs.append([numbers[id(node.parent)], node.move])
+        return pairs
+
+    def extend(self, board: Board, variations: [list]):
+        """
+        adds the nodes stored as variations to a tree of the main line,
+        replaying their moves on board, which shows the main line's last state
+        """
+        nodes = [self.root] + self.path(self.main)
+        at = self.main
+        for parent, mv in variations:
+            parent = nodes[parent]
+            self.walk(board, at, parent)
+            delta = Move(**mv).apply(board)
+            at = Node(parent, mv, delta)
+            parent.children.append(at)
+            nodes.append(at)
+        self.walk(board, at, self.main)
@@ -0,0 +1,115 @@
+import random
+from collections import namedtuple
+from functools import lru_cache
+
+# number of distinct cell codes, see model.state
+CODES = 8
+
+
+@lru_cache(maxsize=16)
+def zobrist_keys(rows: int, cols: int) -> tuple:
+    """
+    random 64 bit keys for every cell code at every cell of a rows x cols board
+    the key of code c at flat index i is <keys>[i * CODES + c], empty cells have key 0
+    keys are seeded by the board shape so every process agrees on them
+    """
+    rnd = random.Random(rows << 32 | cols)
+    return tuple(rnd.getrandbits(64) if code else 0
+                 for i in range(rows * cols) for code in range(CODES))
+
+
+class HashedKeys:
+    """
+    zobrist_keys for boards too large to tabulate: the same indexing,
+    with each key computed when asked for by mixing its index with the board shape
+    """
+    MASK = (1 << 64) - 1
+
+    def __init__(self, rows: int, cols: int):
+        self.seed = (rows << 32 | cols) * 0x9E3779B97F4A7C15 & HashedKeys.MASK
+
+    def __getitem__(self, i: int) -> int:
+        if i % CODES == 0:
+            return 0
+        # splitmix64 finalizer
+        z = (self.seed + i * 0xBF58476D1CE4E5B9) & HashedKeys.MASK
+        z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & HashedKeys.MASK
+        z = (z ^ (z >> 27)) * 0x94D049BB133111EB & HashedKeys.MASK
+        return z ^ (z >> 31)
+
+
+# keys to tell apart the same board with a different player to move
+PLAYER_KEYS = (0, 0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F)
+
+
+def position_key(board: 'Board', player: int) -> int:
+    """the hash of board with player to move"""
+    return board.zobrist ^ PLAYER_KEYS[player]
+
+
+Entry = namedtuple('Entry', ['key', 'value', 'depth', 'flag', 'move'])
+
+# flags telling what kind of search value an Entry holds
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    """
+    A fixed size table of search results keyed by position hash
+    To store and look up a result, call
+        <table>.store(<key>, <value>, depth=<depth>, flag=<flag>, move=<move>)
+        <table>.get(<key>)
+    get returns an Entry or None
+
+    Each key maps to one slot. When a slot already holds another position,
+    policy decides whether it is overwritten:
+        'always' replaces the old entry
+        'depth' replaces it only if the new result was searched as deep or deeper
+    """
+    def __init__(self, size: int = 1 << 16, policy: str = 'depth'):
+        if policy not in ('always', 'depth'):
+            raise ValueError(f'unknown replacement policy {policy!r}')
+        self.size = size
+        self.policy = policy
+        self.slots = [None] * size
+        self.clear_stats()
+
+    def clear_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replaced = 0
+        self.rejected = 0
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.clear_stats()
+
+    def get(self, key: int) -> Entry:
+        entry = self.slots[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, value, depth: int = 0, flag: int = EXACT, move=None):
+        slot = key % self.size
+        old = self.slots[slot]
+        if old is not None and old.key != key:
+            if self.policy == 'depth' and old.depth > depth:
+                self.rejected += 1
+                return
+            self.replaced += 1
+        self.slots[slot] = Entry(key, value, depth, flag, move)
+        self.stores += 1
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.slots)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores, 'replaced': self.replaced,
+                'rejected': self.rejected, 'filled': len(self), 'size': self.size}
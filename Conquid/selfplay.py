@@ -0,0 +1,159 @@
+"""
+Plays computer against computer games without a window, many at a time
+
+Run from this directory, for example
+    python selfplay.py --games 100 --sizes 7x14 14x28 15x29x3 \
+        --p1 negamax:0.2 --p2 mcts:0.2 --workers 4 --out results.jsonl --save-dir games
+
+Players are given as <engine>[:<seconds per move>] with engine one of
+random, negamax or mcts. Board sizes are <rows>x<cols>[x<base size>],
+the base size defaulting to 3 for an odd number of rows and 2 otherwise like File >> New.
+Results are written one line per game as they finish, to JSON lines or, for
+a name ending in .csv, to CSV. Each game can also be saved as a History file.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from model.state import Board, Move, PLAYER
+from model.memory import History
+from model.ai import NegamaxAI
+from model.mcts import MCTS
+from model import savefile
+
+FIELDS = ['game', 'rows', 'cols', 'base_size', 'p1', 'p2', 'winner',
+          'moves', 'seconds', 'move_seconds', 'file']
+
+
+class RandomAI:
+    """plays conquest when it can, otherwise acquires random empty cells"""
+
+    def __init__(self, seed: int = None):
+        self.rnd = random.Random(seed)
+
+    def choose(self, board: Board, player: int) -> Move:
+        if board.can_conquest(player):
+            return Move('Q', player)
+        empty = [idx for idx, code in enumerate(board.cells) if code & PLAYER == 0]
+        if len(empty) < 3:
+            return Move('C', player)
+        return Move('A', player,
+                    locs=[board.position(idx) for idx in self.rnd.sample(empty, 3)])
+
+
+def make_player(spec: str, seed: int):
+    engine, _, limit = spec.partition(':')
+    limit = float(limit) if limit else 0.5
+    if engine == 'random':
+        return RandomAI(seed)
+    if engine == 'negamax':
+        return NegamaxAI(time_limit=limit)
+    if engine == 'mcts':
+        # games already run in parallel, so each search stays in its process
+        return MCTS(time_limit=limit, workers=0, seed=seed)
+    raise ValueError(f'unknown engine {engine!r}')
+
+
+def parse_size(text: str):
+    dims = [int(x) for x in text.lower().split('x')]
+    if len(dims) == 2:
+        dims.append(3 if dims[0] % 2 else 2)
+    if len(dims) != 3 or dims[2] not in (2, 3):
+        raise argparse.ArgumentTypeError(f'bad board size {text!r}')
+    return tuple(dims)
+
+
+def play_game(game: int, size: tuple, p1: str, p2: str, max_moves: int,
+              seed: int, save_dir: str, save_ext: str) -> dict:
+    rows, cols, base_size = size
+    players = {1: make_player(p1, seed), 2: make_player(p2, seed + 1)}
+    history = History(rows, cols, base_size)
+    board = Board(rows, cols, base_size)
+    timings = []
+    winner = 0
+    start = time.perf_counter()
+    for turn in range(max_moves):
+        player = turn % 2 + 1
+        tick = time.perf_counter()
+        move = players[player].choose(board, player)
+        move.apply(board, validate=True)
+        timings.append(round(time.perf_counter() - tick, 6))
+        history.store(move)
+        if move.type == 'Q':
+            winner = player
+            break
+    path = ''
+    if save_dir:
+        path = os.path.join(save_dir, f'game{game:06d}{save_ext}')
+        savefile.save(history, path)
+    return {'game': game, 'rows': rows, 'cols': cols, 'base_size': base_size,
+            'p1': p1, 'p2': p2, 'winner': winner, 'moves': len(history.moves),
+            'seconds': round(time.perf_counter() - start, 6),
+            'move_seconds': timings, 'file': path}
+
+
+class ResultWriter:
+    """streams game results to JSON lines, or CSV for a .csv file, - for stdout"""
+
+    def __init__(self, path: str):
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='')
+        self.csv = None
+        if path.endswith('.csv'):
+            self.csv = csv.DictWriter(self.file, FIELDS)
+            self.csv.writeheader()
+
+    def write(self, result: dict):
+        if self.csv:
+            self.csv.writerow(dict(result, move_seconds=' '.join(map(str, result['move_seconds']))))
+        else:
+            self.file.write(json.dumps(result) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Computer against computer Conquid games')
+    parser.add_argument('--games', type=int, default=10, help='games per board size')
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[(14, 28, 2)],
+                        metavar='ROWSxCOLS[xBASE]')
+    parser.add_argument('--p1', default='negamax:0.2', help='player 1 engine[:seconds]')
+    parser.add_argument('--p2', default='negamax:0.2', help='player 2 engine[:seconds]')
+    parser.add_argument('--max-moves', type=int, default=400,
+                        help='moves after which a game is a draw')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='games played at once, 0 to play in this process')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='-', help='results file, .jsonl or .csv')
+    parser.add_argument('--save-dir', help='directory to save every game to')
+    parser.add_argument('--save-format', choices=['json', 'cqd'], default='cqd')
+    args = parser.parse_args(argv)
+
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+    jobs = [(game, size, args.p1, args.p2, args.max_moves, args.seed + 2 * game,
+             args.save_dir, '.' + args.save_format)
+            for game, size in enumerate(size for size in args.sizes
+                                        for i in range(args.games))]
+    writer = ResultWriter(args.out)
+    try:
+        if args.workers:
+            with ProcessPoolExecutor(args.workers) as pool:
+                for job in as_completed([pool.submit(play_game, *job) for job in jobs]):
+                    writer.write(job.result())
+        else:
+            for job in jobs:
+                writer.write(play_game(*job))
+    finally:
+        writer.close()
+
+
+if __name__ == '__main__':
+    main()
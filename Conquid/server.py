@@ -0,0 +1,162 @@
+"""
+Hosts many Conquid games in one process for remote or automated players
+
+Run from this directory, for example
+    python server.py --port 7878
+    python server.py --unix /tmp/conquid.sock
+
+Clients speak the protocol of model/protocol.py: they create games, join them
+to receive every later move as a delta, and play moves, which are checked with
+the model like in the window. See loadgen.py for a client.
+"""
+
+import argparse
+import asyncio
+import os
+import struct
+from model.state import Board, Move, InvalidMove
+from model.memory import History
+from model.movegen import ACQUIRE_CELLS
+from model import protocol
+from model.protocol import ProtocolError
+
+# largest number of cells of a board a client may create, as building the tables
+# of a new board shape holds up every game. Those tables are only cached for the
+# most recent shapes, so clients picking many shapes cannot grow them without end
+MAX_CELLS = 1 << 15
+# bytes of deltas a joined connection may leave unread before it is dropped
+MAX_BUFFERED = 1 << 20
+
+
+class Session:
+    """One game on the server, with the connections following it"""
+
+    def __init__(self, game: int, rows: int, cols: int, base_size: int):
+        self.game = game
+        self.history = History(rows, cols, base_size)
+        self.board = Board(rows, cols, base_size)
+        self.subscribers = set()
+
+    def state(self) -> bytes:
+        history = self.history
+        return protocol.state_body(self.game, history.rows, history.cols, history.base_size,
+                                   len(history.moves), self.board.cells)
+
+    def play(self, mv: dict):
+        """plays mv for the player whose turn it is, raising InvalidMove if it is illegal"""
+        if self.history.is_finished():
+            raise InvalidMove('the game is finished')
+        if mv['player'] != len(self.history.moves) % 2 + 1:
+            raise InvalidMove(f'it is not the turn of player {mv["player"]}')
+        if mv['type'] not in 'ACVQ':
+            raise InvalidMove(f'unknown move type {mv["type"]!r}')
+        if mv['type'] == 'A' and len(set(mv['locs'])) != ACQUIRE_CELLS:
+            raise InvalidMove(f'acquire takes {ACQUIRE_CELLS} cells')
+        move = Move(**mv)
+        delta = move.apply(self.board, validate=True)
+        self.history.store(move)
+        body = protocol.delta_body(self.game, len(self.history.moves), mv, delta)
+        message = protocol.frame(protocol.DELTA, body)
+        for writer in list(self.subscribers):
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                # not reading its deltas, closing it ends its handler
+                self.subscribers.discard(writer)
+                writer.close()
+            else:
+                writer.write(message)
+
+
+class GameServer:
+    """
+    Serves the games of all connections from one event loop
+    Requests are handled without awaiting anything, so the moves of a game
+    are applied one at a time in the order they arrive
+    """
+    def __init__(self):
+        self.sessions = {}
+        self.next_game = 1
+        self.moves = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        joined = set()
+        try:
+            while True:
+                kind, body = await protocol.read_message(reader)
+                writer.write(self.respond(kind, body, writer, joined))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            for session in joined:
+                session.subscribers.discard(writer)
+            writer.close()
+
+    def respond(self, kind: int, body: bytes, writer, joined: set) -> bytes:
+        game = 0
+        try:
+            if kind == protocol.NEW:
+                rows, cols, base_size = protocol.NEW_BODY.unpack(body)
+                if base_size not in (2, 3) or rows < 3 or cols < 14 or rows * cols > MAX_CELLS:
+                    raise InvalidMove('bad board size')
+                game = self.next_game
+                self.next_game += 1
+                self.sessions[game] = Session(game, rows, cols, base_size)
+                return protocol.frame(protocol.GAME, protocol.GAME_ID.pack(game))
+            if kind == protocol.PLAY:
+                game, mv = protocol.parse_move(body)
+                self.session(game).play(mv)
+                self.moves += 1
+                return protocol.frame(protocol.ACK, protocol.ACK_BODY.pack(
+                    game, len(self.sessions[game].history.moves)))
+            if kind in (protocol.JOIN, protocol.LEAVE):
+                game, = protocol.GAME_ID.unpack(body)
+                session = self.session(game)
+                if kind == protocol.JOIN:
+                    session.subscribers.add(writer)
+                    joined.add(session)
+                else:
+                    session.subscribers.discard(writer)
+                    joined.discard(session)
+                return protocol.frame(protocol.STATE, session.state())
+            raise ProtocolError(f'unknown message {bytes((kind,))!r}')
+        except (InvalidMove, ValueError, IndexError, struct.error) as e:
+            message = str(e) or type(e).__name__
+            return protocol.frame(protocol.ERROR, protocol.GAME_ID.pack(game) + message.encode())
+
+    def session(self, game: int) -> Session:
+        session = self.sessions.get(game)
+        if session is None:
+            raise InvalidMove(f'no game {game}')
+        return session
+
+    async def start(self, host: str = '127.0.0.1', port: int = 7878,
+                    path: str = None) -> asyncio.AbstractServer:
+        """listens on TCP, or on the Unix socket at path if given"""
+        if path:
+            if os.path.exists(path):
+                os.unlink(path)
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(host: str, port: int, path: str):
+    server = await GameServer().start(host, port, path)
+    print('serving on', path or ', '.join(str(s.getsockname()) for s in server.sockets))
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Conquid game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7878)
+    parser.add_argument('--unix', help='Unix socket path to listen on instead of TCP')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()